@@ -0,0 +1,366 @@
+"""Benchmarks of the genome implementations.
+
+Run it as
+
+    python3 src/bench.py --n 10000 100000 1000000 --k 1000 --json out.json
+
+to time whole simulations for every combination of genome size n,
+number of operations k and simulation parameters, and each of the
+three operations on its own for every n. The results are printed as a
+table, and written as JSON if --json is given, together with the
+scaling exponents fitted to them: if the time grows as n^e, the
+exponent is e, so an O(n) operation should get about 1 and an
+O(log n) or O(1) operation about 0.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from itertools import product
+from typing import Any, Iterable, Type
+
+import numpy as np
+
+from genome import BACKENDS, Genome
+from oplog import replay
+from profiling import Profile
+from simulate import SimParams, sim_genome
+
+OPS = ('insert', 'copy', 'disable')
+
+
+@dataclass
+class SimResult:
+    """Timings for one simulation setup."""
+
+    backend: str
+    n: int
+    k: int
+    theta: dict[str, Any]
+    seconds: list[float]    # one per repetition
+    peak_bytes: int         # peak memory allocated during a run
+    profile: dict[str, Any] | None = None  # Profile.report() of a run
+
+    @property
+    def best(self) -> float:
+        """The fastest of the repetitions."""
+        return min(self.seconds)
+
+
+@dataclass
+class OpResult:
+    """Time per call of one operation in a genome of size n."""
+
+    backend: str
+    n: int
+    op: str
+    seconds: float          # per call, the best of the repetitions
+
+
+def fit_exponent(xs: Iterable[float], ys: Iterable[float]) -> float | None:
+    """
+    Fit ys = c * xs^e and return e.
+
+    This is the slope of a least squares line through the points on a
+    log-log scale. We need at least two different xs for that.
+
+    >>> round(fit_exponent([10, 100, 1000], [2, 20, 200]), 6)
+    1.0
+    >>> abs(round(fit_exponent([10, 100, 1000], [5, 5, 5]), 6))
+    0.0
+    >>> print(fit_exponent([10], [1]))
+    None
+    """
+    x, y = np.log(list(xs)), np.log(list(ys))
+    if len(set(x)) < 2:
+        return None
+    slope, _ = np.polyfit(x, y, 1)
+    return float(slope)
+
+
+def time_sim(backend: str, n: int, k: int, theta: SimParams,
+             *, seed: int, repeat: int, warmup: int,
+             profile: bool = False) -> SimResult:
+    """
+    Time sim_genome(n, k) with a backend.
+
+    The simulation is run warmup times without timing it first, and
+    then repeat times with. Memory is measured in a separate run, since
+    tracemalloc slows everything down. If profile is true, another run
+    records the time spent in each operation.
+    """
+    genome_class = BACKENDS[backend]
+
+    def run() -> None:
+        sim_genome(n, k, theta=theta, seed=seed,
+                   genome_class=genome_class).close()
+
+    for _ in range(warmup):
+        run()
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    report = None
+    if profile:
+        prof = Profile()
+        sim_genome(n, k, theta=theta, seed=seed, genome_class=genome_class,
+                   profile=prof).close()
+        report = prof.report()
+
+    return SimResult(backend, n, k, asdict(theta), seconds, peak, report)
+
+
+def _setup(genome_class: Type[Genome], n: int, tes: int, te_len: int,
+           rng: random.Random) -> Genome:
+    """Make a genome of size n with tes active TEs."""
+    genome = genome_class(n)
+    for _ in range(tes):
+        genome.insert_te(rng.randrange(len(genome) + 1), te_len)
+    return genome
+
+
+def time_ops(backend: str, n: int, *, calls: int, tes: int, te_len: int,
+             seed: int, repeat: int, warmup: int) -> list[OpResult]:
+    """
+    Time each operation on its own in a genome of size n.
+
+    Every repetition starts from a fresh genome with tes active TEs of
+    length te_len, and makes calls calls of each operation, in the order
+    insert, copy and disable. Copies and disables pick a random active
+    TE and so include the (constant) time for that.
+    """
+    genome_class = BACKENDS[backend]
+    best = dict.fromkeys(OPS, float('inf'))
+    for rep in range(warmup + repeat):
+        rng = random.Random(seed)
+        genome = _setup(genome_class, n, tes, te_len, rng)
+        positions = [rng.randrange(n) for _ in range(calls)]
+        offsets = [rng.randrange(-n, n) for _ in range(calls)]
+        seconds = {}
+
+        start = time.perf_counter()
+        for pos in positions:
+            genome.insert_te(pos, te_len)
+        seconds['insert'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in offsets:
+            genome.copy_te(genome.random_active(rng), offset)
+        seconds['copy'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(min(calls, genome.num_active())):
+            genome.disable_te(genome.random_active(rng))
+        seconds['disable'] = time.perf_counter() - start
+        genome.close()
+
+        if rep >= warmup:
+            for op in OPS:
+                best[op] = min(best[op], seconds[op] / calls)
+
+    return [OpResult(backend, n, op, best[op]) for op in OPS]
+
+
+def time_replay(backend: str, log: str, *, repeat: int,
+                warmup: int) -> dict[str, Any]:
+    """
+    Time replaying the operation log in the file log with a backend.
+
+    Unlike time_sim, this runs exactly the same operations whatever
+    the backend, and doesn't spend any time on random numbers.
+    """
+    genome_class = BACKENDS[backend]
+    seconds = []
+    for rep in range(warmup + repeat):
+        start = time.perf_counter()
+        replay(log, genome_class, check=False).close()
+        if rep >= warmup:
+            seconds.append(time.perf_counter() - start)
+    return dict(backend=backend, log=log, seconds=seconds, best=min(seconds))
+
+
+def exponents(sims: list[SimResult],
+              ops: list[OpResult]) -> dict[str, Any]:
+    """
+    Fit scaling exponents to the results.
+
+    For operations we fit the time per call against n. For simulations
+    we fit the time against n for each k and parameters, and against k
+    for each n and parameters.
+    """
+    result: dict[str, Any] = {'ops': {}, 'sim_n': [], 'sim_k': []}
+    for backend in dict.fromkeys(r.backend for r in ops):
+        result['ops'][backend] = {
+            op: fit_exponent(*zip(*[(r.n, r.seconds) for r in ops
+                                    if r.backend == backend and r.op == op]))
+            for op in OPS
+        }
+
+    def group(key: str, over: str) -> None:
+        groups: dict[str, list[SimResult]] = {}
+        for r in sims:
+            label = json.dumps([r.backend, getattr(r, key), r.theta])
+            groups.setdefault(label, []).append(r)
+        for label, rs in groups.items():
+            backend, value, theta = json.loads(label)
+            result[f'sim_{over}'].append(dict(
+                backend=backend, theta=theta, **{key: value},
+                exponent=fit_exponent([getattr(r, over) for r in rs],
+                                      [r.best for r in rs])
+            ))
+
+    group('k', 'n')
+    group('n', 'k')
+    return result
+
+
+def run(backends: list[str], ns: list[int], ks: list[int],
+        thetas: list[SimParams], *, calls: int, tes: int, seed: int,
+        repeat: int, warmup: int, profile: bool = False,
+        log=sys.stderr) -> dict[str, Any]:
+    """Run all the benchmarks and collect the results as JSON data."""
+    sims = []
+    for backend, n, k, theta in product(backends, ns, ks, thetas):
+        print(f"sim {backend} n={n} k={k} {theta}", file=log)
+        sims.append(time_sim(backend, n, k, theta, seed=seed,
+                             repeat=repeat, warmup=warmup, profile=profile))
+    ops = []
+    for backend, n in product(backends, ns):
+        print(f"ops {backend} n={n}", file=log)
+        ops.extend(time_ops(backend, n, calls=calls, tes=tes,
+                            te_len=thetas[0].te_len, seed=seed,
+                            repeat=repeat, warmup=warmup))
+
+    return dict(
+        config=dict(backends=backends, n=ns, k=ks,
+                    theta=[asdict(theta) for theta in thetas],
+                    calls=calls, tes=tes, seed=seed,
+                    repeat=repeat, warmup=warmup),
+        sims=[dict(asdict(r), best=r.best) for r in sims],
+        ops=[asdict(r) for r in ops],
+        exponents=exponents(sims, ops),
+    )
+
+
+def report(results: dict[str, Any], out=sys.stdout) -> None:
+    """Print the results as tables."""
+    print(f"{'backend':>9} {'n':>9} {'k':>7} {'te_len':>6} "
+          f"{'weights':>17} {'best s':>9} {'peak MB':>8}", file=out)
+    for r in results['sims']:
+        weights = ','.join(f"{w:g}" for w in r['theta']['weights'])
+        print(f"{r['backend']:>9} {r['n']:>9} {r['k']:>7} "
+              f"{r['theta']['te_len']:>6} {weights:>17} "
+              f"{r['best']:>9.4f} {r['peak_bytes'] / 1e6:>8.1f}", file=out)
+    print(file=out)
+
+    profiled = [r for r in results['sims'] if r['profile'] is not None]
+    if profiled:
+        print(f"{'backend':>9} {'n':>9} {'k':>7} " +
+              ' '.join(f"{op + ' s':>10}" for op in OPS), file=out)
+        for r in profiled:
+            print(f"{r['backend']:>9} {r['n']:>9} {r['k']:>7} " +
+                  ' '.join(f"{r['profile'][op]['seconds']:>10.4f}"
+                           for op in OPS), file=out)
+        print(file=out)
+
+    print(f"{'backend':>9} {'n':>9} " +
+          ' '.join(f"{op + ' us':>10}" for op in OPS), file=out)
+    for i in range(0, len(results['ops']), len(OPS)):
+        rs = results['ops'][i:i + len(OPS)]
+        print(f"{rs[0]['backend']:>9} {rs[0]['n']:>9} " +
+              ' '.join(f"{r['seconds'] * 1e6:>10.2f}" for r in rs), file=out)
+    print(file=out)
+
+    print("exponents in n per operation", file=out)
+    for backend, exps in results['exponents']['ops'].items():
+        print(f"{backend:>9} " + ' '.join(
+            f"{op}={'-' if e is None else f'{e:.2f}'}"
+            for op, e in exps.items()
+        ), file=out)
+
+
+def _weights(text: str) -> tuple[float, float, float]:
+    """Parse insert,copy,disable weights from the command line."""
+    try:
+        ins, cpy, dis = (float(w) for w in text.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f"expected three comma-separated numbers, got {text!r}"
+        ) from None
+    return ins, cpy, dis
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the genome implementations."
+    )
+    parser.add_argument('--backend', nargs='+', choices=list(BACKENDS),
+                        default=list(BACKENDS))
+    parser.add_argument('--n', nargs='+', type=int,
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--k', nargs='+', type=int, default=[1000])
+    parser.add_argument('--te-len', nargs='+', type=int,
+                        default=[SimParams.te_len])
+    parser.add_argument('--weights', nargs='+', type=_weights, default=None,
+                        help="insert,copy,disable weights, "
+                             "e.g. 0.1,2,1 (the default)")
+    parser.add_argument('--calls', type=int, default=200,
+                        help="calls per operation when timing them")
+    parser.add_argument('--tes', type=int, default=200,
+                        help="active TEs when timing operations")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=2022)
+    parser.add_argument('--profile', action='store_true',
+                        help="also record the time spent in each "
+                             "operation during the simulations")
+    parser.add_argument('--replay', metavar='LOG',
+                        help="time replaying this operation log (see "
+                             "oplog.py) instead of simulating")
+    parser.add_argument('--json', metavar='FILE',
+                        help="write the results here as JSON")
+    args = parser.parse_args(argv)
+
+    weights = [SimParams.weights] if args.weights is None else args.weights
+    thetas = [SimParams(te_len=te_len, weights=ws)
+              for te_len, ws in product(args.te_len, weights)]
+
+    if args.replay is not None:
+        replays = [time_replay(backend, args.replay, repeat=args.repeat,
+                               warmup=args.warmup)
+                   for backend in args.backend]
+        for r in replays:
+            print(f"{r['backend']:>9} {r['best']:>9.4f}")
+        if args.json is not None:
+            with open(args.json, 'w') as f:
+                json.dump(dict(replays=replays), f, indent=2)
+        return
+
+    results = run(args.backend, args.n, args.k, thetas,
+                  calls=args.calls, tes=args.tes, seed=args.seed,
+                  repeat=args.repeat, warmup=args.warmup,
+                  profile=args.profile)
+    report(results)
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Checkpoints of running simulations.
+
+A checkpoint file holds everything needed to continue a simulation:
+the genome, run-length encoded, and the state of the random number
+generator. The layout is
+
+    magic               8 bytes, b'TECKPT\\x00\\x01'
+    header length       uint32
+    header              JSON; simulation parameters, progress, the
+                        genome's counters and the bit generator state
+    streams             for each of the sampler's streams, the numbers
+                        it has drawn but not used yet, as float64 or
+                        int64 (the header says how many)
+    active              the genome's active TEs in sampling order,
+                        as int64
+    runs                (char, length, te) as '<cQQ' records until the
+                        end of the file
+
+All integers are little-endian. The runs are read straight out of a
+memory map of the file, so loading a checkpoint doesn't need memory
+for more than the genome being built.
+"""
+
+from __future__ import annotations
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from typing import Any, Iterator, Type
+
+import numpy as np
+
+from genome import Genome
+
+MAGIC = b'TECKPT\x00\x01'
+_LEN = struct.Struct('<I')
+_RUN = struct.Struct('<cQQ')
+_STREAM_TYPES = ('<f8', '<i8', '<i8')  # random, te_len, te_offset
+
+
+@dataclass
+class Checkpoint:
+    """A simulation loaded from a checkpoint file."""
+
+    genome: Genome
+    meta: dict[str, Any]   # the header, see save_checkpoint
+    streams: list[list]    # unused numbers for each sampler stream
+
+
+def save_checkpoint(path: str, genome: Genome, meta: dict[str, Any],
+                    streams: list[list]) -> None:
+    """
+    Write a checkpoint for genome to path.
+
+    meta is whatever the simulator needs to resume, and must be JSON
+    serialisable; the genome's id and counters are added to it. streams
+    are the sampler's unused numbers, see Sampler.state().
+
+    The file is written next to path and then moved over it, so a run
+    that is killed while writing leaves the previous checkpoint intact.
+    """
+    meta = dict(meta,
+                id=genome.id,
+                te_bp=genome.te_bp,
+                disabled_bp=genome.disabled_bp,
+                n_disabled=genome.n_disabled,
+                te_lengths=sorted(genome.te_lengths.items()),
+                streams=[len(stream) for stream in streams],
+                active=genome.num_active())
+    header = json.dumps(meta).encode()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_LEN.pack(len(header)))
+        f.write(header)
+        for stream, dtype in zip(streams, _STREAM_TYPES):
+            f.write(np.asarray(stream, dtype=dtype).tobytes())
+        f.write(np.asarray(genome.sampling_order(), dtype='<i8').tobytes())
+        for char, length, te in genome.iter_runs():
+            f.write(_RUN.pack(char.encode('ascii'), length, te))
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str, genome_class: Type[Genome]) -> Checkpoint:
+    """
+    Load a checkpoint from path.
+
+    The genome is rebuilt as a genome_class, which doesn't have to be
+    the class that saved it.
+    """
+    with open(path, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a checkpoint file")
+        offset = len(MAGIC)
+        (header_len,) = _LEN.unpack_from(mm, offset)
+        offset += _LEN.size
+        meta = json.loads(mm[offset:offset + header_len])
+        offset += header_len
+
+        streams = []
+        for count, dtype in zip(meta['streams'], _STREAM_TYPES):
+            stream = np.frombuffer(mm, dtype=dtype, count=count,
+                                   offset=offset)
+            streams.append(stream.tolist())
+            offset += stream.nbytes
+            del stream  # release the buffer so mm can be closed
+        active = np.frombuffer(mm, dtype='<i8', count=meta['active'],
+                               offset=offset)
+        order = active.tolist()
+        offset += active.nbytes
+        del active
+
+        view = memoryview(mm)[offset:]
+        try:
+            genome = genome_class.from_runs(_runs(view))
+        finally:
+            view.release()
+
+    genome.set_sampling_order(order)
+    genome.id = meta['id']
+    genome.te_bp = meta['te_bp']
+    genome.disabled_bp = meta['disabled_bp']
+    genome.n_disabled = meta['n_disabled']
+    genome.te_lengths.update(dict(meta['te_lengths']))
+    return Checkpoint(genome, meta, streams)
+
+
+def _runs(view: memoryview) -> Iterator[tuple[str, int, int]]:
+    """Decode the runs in a checkpoint."""
+    for char, length, te in _RUN.iter_unpack(view):
+        yield char.decode('ascii'), length, te
@@ -0,0 +1,264 @@
+"""Differential fuzzing of the genome implementations.
+
+ListGenome is the reference: it is the simplest implementation, so we
+trust it. The fuzzer makes random operations, runs them on the
+reference and on the other implementations, and compares the results
+of the operations, and str(), len() and active_tes() of the genomes,
+every few operations. When something differs, it shrinks the
+operations to a short sequence that still shows the difference.
+
+Run it as
+
+    python3 src/fuzz.py --seeds 1000
+
+or use fuzz() and check() from the tests.
+
+>>> ops = random_ops(10, 5, random.Random(1))
+>>> ops
+[(1, 1, 5), (1, 14, 8), (2, 1, 24), (1, 26, 7), (2, 3, 78)]
+>>> print(check(10, ops, BACKENDS))
+None
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, Type
+
+from genome import BACKENDS, COPY, DISABLE, INSERT, Genome, ListGenome
+
+Op = tuple[int, int, int]  # (op, a, b) as for Genome.apply_ops
+
+
+@dataclass
+class Failure:
+    """A difference between a genome and the reference."""
+
+    backend: str
+    batch: bool     # whether the operations were applied in batches
+    n: int          # initial genome length
+    ops: list[Op]   # operations up to where the difference showed
+    what: str       # what differed, or the exception raised
+
+    def __str__(self) -> str:
+        """Describe the failure so it can be reproduced."""
+        how = "apply_ops" if self.batch else "one at a time"
+        return (f"{self.backend} ({how}), n={self.n}: {self.what}\n"
+                f"ops = {self.ops!r}")
+
+
+def random_ops(n: int, k: int, rng: random.Random, *,
+               max_len: int = 10, max_offset: int = 100) -> list[Op]:
+    """
+    Make k random operations for a genome of initial length n.
+
+    The operations are valid for the genome as it is when they are
+    applied: inserts are at most at the end, and copies and disables
+    mostly pick active TEs, but sometimes ones that are disabled.
+    """
+    reference = ListGenome(n)
+    ops: list[Op] = []
+    for _ in range(k):
+        r = rng.random()
+        if r < 0.4 or reference.id == 0:
+            op = (INSERT, rng.randint(0, len(reference)),
+                  rng.randint(1, max_len))
+        else:
+            active = reference.active_tes()
+            if active and rng.random() < 0.8:
+                te = rng.choice(active)
+            else:
+                te = rng.randint(1, reference.id)
+            if r < 0.7:
+                op = (COPY, te, rng.randint(-max_offset, max_offset))
+            else:
+                op = (DISABLE, te, 0)
+        Genome.apply_ops(reference, [op])
+        ops.append(op)
+    return ops
+
+
+def normalise(n: int, ops: Iterable[Op]) -> list[Op]:
+    """
+    Make ops valid for a genome of initial length n.
+
+    When the shrinker removes operations, the genome gets shorter, so
+    later inserts can end up past the end of it; they are moved to the
+    end.
+    """
+    reference = ListGenome(n)
+    result = []
+    for op, a, b in ops:
+        if op == INSERT:
+            a = min(a, len(reference))
+        Genome.apply_ops(reference, [(op, a, b)])
+        result.append((op, a, b))
+    return result
+
+
+def check(n: int, ops: list[Op], backends: dict[str, Type[Genome]], *,
+          every: int = 10, batch: bool = False,
+          timings: dict[str, float] | None = None) -> Failure | None:
+    """
+    Run ops on each of the backends and compare them to the reference.
+
+    The genomes are compared every `every` operations. If batch is
+    true, those operations are applied with the backend's apply_ops,
+    otherwise one at a time. Returns the first difference found, or
+    None. If timings is given, the time each backend spent on the
+    operations is added to it.
+    """
+    reference = ListGenome(n)
+    genomes = {name: cls(n) for name, cls in backends.items()}
+    try:
+        for start in range(0, len(ops), every):
+            chunk = ops[start:start + every]
+            expected = Genome.apply_ops(reference, chunk)
+            for name, genome in genomes.items():
+                try:
+                    begin = time.perf_counter()
+                    got = genome.apply_ops(chunk) if batch \
+                        else Genome.apply_ops(genome, chunk)
+                    if timings is not None:
+                        timings[name] = timings.get(name, 0.0) + \
+                            time.perf_counter() - begin
+                    what = _compare(genome, reference, got, expected)
+                except Exception as e:  # a crash is a difference too
+                    what = f"raised {e!r}"
+                if what is not None:
+                    return Failure(name, batch, n,
+                                   ops[:start + len(chunk)], what)
+        return None
+    finally:
+        for genome in genomes.values():
+            genome.close()
+
+
+def _compare(genome: Genome, reference: Genome,
+             got: list[int | None], expected: list[int | None]
+             ) -> str | None:
+    """Describe how genome differs from the reference, if it does."""
+    if got != expected:
+        return f"returned {got}, expected {expected}"
+    if len(genome) != len(reference):
+        return f"len() is {len(genome)}, expected {len(reference)}"
+    if genome.active_tes() != reference.active_tes():
+        return (f"active_tes() is {genome.active_tes()}, "
+                f"expected {reference.active_tes()}")
+    if str(genome) != str(reference):
+        return f"str() is {str(genome)!r}, expected {str(reference)!r}"
+    return None
+
+
+def shrink(n: int, ops: list[Op],
+           fails: Callable[[int, list[Op]], bool]) -> tuple[int, list[Op]]:
+    """
+    Find a smaller n and ops for which fails(n, ops) is still true.
+
+    We remove ever smaller chunks of operations, then make the
+    remaining operations simpler, and then try smaller initial genomes.
+    The result is not necessarily the smallest possible, but no single
+    operation can be removed from it.
+    """
+    ops = normalise(n, ops)
+    chunk = max(1, len(ops) // 2)
+    while True:
+        i = 0
+        while i < len(ops):
+            candidate = normalise(n, ops[:i] + ops[i + chunk:])
+            if fails(n, candidate):
+                ops = candidate
+            else:
+                i += chunk
+        if chunk == 1:
+            break
+        chunk //= 2
+
+    for i, (op, a, b) in enumerate(ops):
+        if op == INSERT:
+            simpler = [(op, 0, b), (op, a, 1)]
+        elif op == COPY:
+            simpler = [(op, a, 0), (op, a, b // 2)]
+        else:
+            simpler = []
+        for simple in simpler:
+            candidate = normalise(n, ops[:i] + [simple] + ops[i + 1:])
+            if simple != ops[i] and fails(n, candidate):
+                ops = candidate
+
+    for smaller in (0, n // 2, n - 1):
+        if 0 <= smaller < n and fails(smaller, normalise(smaller, ops)):
+            n, ops = smaller, normalise(smaller, ops)
+    return n, ops
+
+
+def fuzz(backends: dict[str, Type[Genome]], seeds: Iterable[int], *,
+         n: int = 50, k: int = 200, every: int = 10,
+         timings: dict[str, float] | None = None) -> Iterator[Failure]:
+    """
+    Fuzz the backends, one run for each seed.
+
+    Each run makes k random operations on a genome of random initial
+    length up to n, and checks them both one at a time and in batches.
+    Yields the failures, shrunk.
+    """
+    for seed in seeds:
+        rng = random.Random(seed)
+        size = rng.randint(0, n)
+        ops = random_ops(size, k, rng)
+        for batch in (False, True):
+            failure = check(size, ops, backends, every=every, batch=batch,
+                            timings=timings)
+            if failure is None:
+                continue
+            cls = {failure.backend: backends[failure.backend]}
+
+            def fails(n: int, ops: list[Op]) -> bool:
+                return check(n, ops, cls, every=1, batch=batch) is not None
+
+            small_n, small_ops = shrink(failure.n, failure.ops, fails)
+            failure = check(small_n, small_ops, cls, every=1, batch=batch)
+            assert failure is not None
+            yield failure
+            break
+
+
+def main(argv: list[str] | None = None) -> None:
+    """Run the fuzzer from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Compare the genome implementations to ListGenome "
+                    "on random operations."
+    )
+    parser.add_argument('--backend', nargs='+', choices=list(BACKENDS),
+                        default=[b for b in BACKENDS if b != 'list'])
+    parser.add_argument('--seeds', type=int, default=200,
+                        help="number of runs")
+    parser.add_argument('--start', type=int, default=0,
+                        help="first seed")
+    parser.add_argument('--n', type=int, default=50,
+                        help="max initial genome length")
+    parser.add_argument('--k', type=int, default=200,
+                        help="operations per run")
+    parser.add_argument('--every', type=int, default=10,
+                        help="compare the genomes this often")
+    args = parser.parse_args(argv)
+
+    backends = {name: BACKENDS[name] for name in args.backend}
+    timings: dict[str, float] = {}
+    failures = 0
+    for failure in fuzz(backends, range(args.start, args.start + args.seeds),
+                        n=args.n, k=args.k, every=args.every,
+                        timings=timings):
+        failures += 1
+        print(failure, end='\n\n')
+    for name, seconds in timings.items():
+        print(f"{name:>9} {seconds:>9.4f} s")
+    print(f"{failures} failures in {args.seeds} runs")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
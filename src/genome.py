@@ -1,8 +1,16 @@
 """A circular genome for simulating transposable elements."""
 
 from __future__ import annotations
+import mmap
+import os
+import random
+import re
+import weakref
+from collections import Counter
+from itertools import repeat
+from dataclasses import dataclass
 from typing import (
-    Generic, Iterable, TypeVar, Protocol
+    Any, Generic, IO, Iterable, Iterator, TypeVar, Protocol
 )
 
 from abc import (
@@ -12,9 +20,6 @@ from abc import (
     abstractmethod
 )
 
-from typing import (
-    Generic, TypeVar, Protocol)
-
 class Comparable(Protocol):
     """Type info for specifying that objects can be compared with <."""
 
@@ -23,13 +28,25 @@ class Comparable(Protocol):
         ...
 
 
+class RandomSource(Protocol):
+    """Type info for random number generators, e.g. random.Random."""
+
+    def random(self) -> float:
+        """Get a random float in [0, 1)."""
+        ...
+
+
 T = TypeVar('T')
 S = TypeVar('S', bound=Comparable)
+G = TypeVar('G', bound='Genome')
 
 
 class Link(Generic[T]):
     """Doubly linked link."""
 
+    # A genome has a link per nucleotide, so no __dict__ for them
+    __slots__ = ('val', 'prev', 'next')
+
     val: T
     prev: Link[T]
     next: Link[T]
@@ -41,11 +58,485 @@ class Link(Generic[T]):
         self.next = n
 
 
-def insert_after(link: Link[T], val: T) -> None:
-    """Add a new link containing val after link."""
+def insert_after(link: Link[T], val: T) -> Link[T]:
+    """Add a new link containing val after link and return it."""
     new_link = Link(val, link, link.next)
     new_link.prev.next = new_link
     new_link.next.prev = new_link
+    return new_link
+
+
+# Priorities for SeqTree nodes. The tree has its own generator so building
+# a tree doesn't consume numbers from the simulator's random stream.
+_priorities = random.Random(0)
+
+
+class TreeNode(Generic[T]):
+    """Node in a SeqTree."""
+
+    __slots__ = ('val', 'weight', 'total', 'prio', 'left', 'right', 'parent')
+
+    val: T
+    weight: int
+    total: int
+    prio: float
+    left: TreeNode[T] | None
+    right: TreeNode[T] | None
+    parent: TreeNode[T] | None
+
+    def __init__(self, val: T, weight: int):
+        """Create a detached node holding val with the given weight."""
+        self.val = val
+        self.weight = weight
+        self.total = weight
+        self.prio = _priorities.random()
+        self.left = self.right = self.parent = None
+
+
+class SeqTree(Generic[T]):
+    """
+    Balanced tree over a sequence of weighted nodes.
+
+    The tree is a treap ordered by position in the sequence, not by
+    key. Every node has a weight (the number of nucleotides it covers,
+    say) and knows the total weight of its subtree, so we can find the
+    node covering a position, or the position where a node starts, in
+    O(log r) expected time for r nodes. Inserting and removing nodes
+    costs the same.
+
+    >>> t = SeqTree()
+    >>> a = t.insert_after(None, 3, 'a')
+    >>> c = t.insert_after(a, 2, 'c')
+    >>> b = t.insert_after(a, 4, 'b')
+    >>> [(node.val, t.position(node)) for node in t]
+    [('a', 0), ('b', 3), ('c', 7)]
+    >>> node, offset = t.locate(5)
+    >>> node.val, offset
+    ('b', 2)
+    """
+
+    root: TreeNode[T] | None
+
+    def __init__(self) -> None:
+        """Create an empty tree."""
+        self.root = None
+
+    @property
+    def total(self) -> int:
+        """Get the total weight of all nodes."""
+        return self.root.total if self.root else 0
+
+    def __iter__(self) -> Iterator[TreeNode[T]]:
+        """Iterate through the nodes in sequence order."""
+        node = self.first()
+        while node:
+            yield node
+            node = self.next(node)
+
+    def first(self) -> TreeNode[T] | None:
+        """Get the first node in the sequence."""
+        node = self.root
+        while node and node.left:
+            node = node.left
+        return node
+
+    def last(self) -> TreeNode[T] | None:
+        """Get the last node in the sequence."""
+        node = self.root
+        while node and node.right:
+            node = node.right
+        return node
+
+    @staticmethod
+    def next(node: TreeNode[T]) -> TreeNode[T] | None:
+        """Get the node following node in the sequence."""
+        if node.right:
+            node = node.right
+            while node.left:
+                node = node.left
+            return node
+        while node.parent and node.parent.right is node:
+            node = node.parent
+        return node.parent
+
+    @staticmethod
+    def prev(node: TreeNode[T]) -> TreeNode[T] | None:
+        """Get the node preceding node in the sequence."""
+        if node.left:
+            node = node.left
+            while node.right:
+                node = node.right
+            return node
+        while node.parent and node.parent.left is node:
+            node = node.parent
+        return node.parent
+
+    @staticmethod
+    def position(node: TreeNode[T]) -> int:
+        """Get the position where node starts."""
+        pos = node.left.total if node.left else 0
+        while node.parent:
+            parent = node.parent
+            if parent.right is node:
+                pos += parent.weight
+                if parent.left:
+                    pos += parent.left.total
+            node = parent
+        return pos
+
+    def locate(self, index: int) -> tuple[TreeNode[T], int]:
+        """
+        Find the node covering position index.
+
+        Returns the node and the offset of index into it. Nodes with
+        weight zero never cover a position.
+        """
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        node = self.root
+        while node:
+            left = node.left.total if node.left else 0
+            if index < left:
+                node = node.left
+            elif index < left + node.weight:
+                return node, index - left
+            else:
+                index -= left + node.weight
+                node = node.right
+        assert False, "subtree totals are inconsistent"
+
+    def insert_after(self, node: TreeNode[T] | None,
+                     weight: int, val: T) -> TreeNode[T]:
+        """
+        Insert a new node after node.
+
+        If node is None, the new node goes first in the sequence.
+        Returns the new node.
+        """
+        new = TreeNode(val, weight)
+        if self.root is None:
+            self.root = new
+            return new
+        if node is None:
+            parent = self.root
+            while parent.left:
+                parent = parent.left
+            parent.left = new
+        elif node.right is None:
+            parent = node
+            parent.right = new
+        else:
+            parent = node.right
+            while parent.left:
+                parent = parent.left
+            parent.left = new
+        new.parent = parent
+        ancestor: TreeNode[T] | None = parent
+        while ancestor:
+            ancestor.total += weight
+            ancestor = ancestor.parent
+        while new.parent and new.parent.prio > new.prio:
+            self._rotate_up(new)
+        return new
+
+    def remove(self, node: TreeNode[T]) -> None:
+        """Remove node from the tree."""
+        while node.left and node.right:
+            if node.left.prio < node.right.prio:
+                self._rotate_up(node.left)
+            else:
+                self._rotate_up(node.right)
+        child = node.left or node.right
+        parent = node.parent
+        if child:
+            child.parent = parent
+        if parent is None:
+            self.root = child
+        elif parent.left is node:
+            parent.left = child
+        else:
+            parent.right = child
+        while parent:
+            parent.total -= node.weight
+            parent = parent.parent
+        node.left = node.right = node.parent = None
+
+    @staticmethod
+    def reweigh(node: TreeNode[T], weight: int) -> None:
+        """Change the weight of node."""
+        delta = weight - node.weight
+        node.weight = weight
+        n: TreeNode[T] | None = node
+        while n:
+            n.total += delta
+            n = n.parent
+
+    def _rotate_up(self, node: TreeNode[T]) -> None:
+        """Rotate node above its parent."""
+        parent = node.parent
+        assert parent is not None
+        grand = parent.parent
+        if parent.left is node:
+            parent.left = node.right
+            if node.right:
+                node.right.parent = parent
+            node.right = parent
+        else:
+            parent.right = node.left
+            if node.left:
+                node.left.parent = parent
+            node.left = parent
+        parent.parent = node
+        node.parent = grand
+        if grand is None:
+            self.root = node
+        elif grand.left is parent:
+            grand.left = node
+        else:
+            grand.right = node
+        parent.total = parent.weight + \
+            (parent.left.total if parent.left else 0) + \
+            (parent.right.total if parent.right else 0)
+        node.total = node.weight + \
+            (node.left.total if node.left else 0) + \
+            (node.right.total if node.right else 0)
+
+
+class ActiveTEs(Generic[T]):
+    """
+    Active TEs, mapped to whatever a genome wants to keep for them.
+
+    Works like a dict (and it remembers the order the TEs were added in,
+    like a dict does), but the TEs are also kept in an array, with each
+    TE's position in the array in the dict. Removing a TE moves the last
+    TE in the array into its slot, so we can remove TEs and pick a
+    random TE in O(1).
+
+    >>> tes = ActiveTEs()
+    >>> for te in (1, 2, 3):
+    ...     tes[te] = 'TE %d' % te
+    >>> tes.remove(1)
+    'TE 1'
+    >>> list(tes), tes.dense
+    ([2, 3], [3, 2])
+    """
+
+    def __init__(self) -> None:
+        """Create an empty set of TEs."""
+        self.dense: list[int] = []
+        self.slots: dict[int, tuple[int, T]] = {}  # te -> (index, value)
+
+    def __contains__(self, te: object) -> bool:
+        """Check if te is active."""
+        return te in self.slots
+
+    def __len__(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.dense)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate through the TEs in the order they were added."""
+        return iter(self.slots)
+
+    def __getitem__(self, te: int) -> T:
+        """Get the value for te."""
+        return self.slots[te][1]
+
+    def __setitem__(self, te: int, val: T) -> None:
+        """Add te, or change its value if it is already there."""
+        if te in self.slots:
+            self.slots[te] = (self.slots[te][0], val)
+        else:
+            self.slots[te] = (len(self.dense), val)
+            self.dense.append(te)
+
+    def get(self, te: int, default: T | None = None) -> T | None:
+        """Get the value for te, or default if te isn't active."""
+        slot = self.slots.get(te)
+        return default if slot is None else slot[1]
+
+    def pop(self, te: int, default: T | None = None) -> T | None:
+        """Remove te and return its value, or default if it isn't active."""
+        if te not in self.slots:
+            return default
+        return self.remove(te)
+
+    def remove(self, te: int) -> T:
+        """Remove te and return its value; KeyError if it isn't active."""
+        i, val = self.slots.pop(te)
+        last = self.dense.pop()
+        if last != te:
+            self.dense[i] = last
+            self.slots[last] = (i, self.slots[last][1])
+        return val
+
+    def reorder(self, dense: Iterable[int]) -> None:
+        """Put the TEs in the array in the given order."""
+        self.dense = list(dense)
+        assert len(self.dense) == len(self.slots)
+        for i, te in enumerate(self.dense):
+            self.slots[te] = (i, self.slots[te][1])
+
+    def random(self, rng: RandomSource) -> int:
+        """Pick a random active TE."""
+        if not self.dense:
+            raise IndexError("no active TEs")
+        return self.dense[int(rng.random() * len(self.dense))]
+
+
+class TEIndex:
+    """
+    The active TEs of a genome, indexed by position.
+
+    The TEs sit in a SeqTree in the order they appear in the genome,
+    after a sentinel node that stands for the start of the genome. The
+    weight of a node is the distance from its start to the start of the
+    next TE (or to the end of the genome), so a node's position in the
+    tree is where the TE starts, and the total weight is the length of
+    the genome.
+
+    Because a start is only ever stored relative to the previous TE,
+    inserting nucleotides shifts every TE downstream by changing the
+    weight of a single node. Finding the TE at a position, the start of
+    a TE, and inserting or removing TEs all take O(log a) for a active
+    TEs.
+
+    >>> tes = TEIndex(20)
+    >>> tes.insert(5, 1, 10)
+    >>> tes.insert(2, 2, 3)      # shifts TE 1 three to the right
+    >>> tes.start(1), tes.start(2)
+    (8, 2)
+    >>> tes.hit(9), tes.hit(18), tes.hit(19)
+    (1, 1, None)
+    >>> tes.remove(2)
+    (2, 3)
+    >>> list(tes)
+    [1]
+    """
+
+    def __init__(self, n: int):
+        """Create an index for a genome of length n with no TEs."""
+        self.tree: SeqTree[tuple[int, int] | None] = SeqTree()
+        self.sentinel = self.tree.insert_after(None, n, None)
+        # Nodes by TE id; the dict also remembers insertion order
+        self.nodes: ActiveTEs[TreeNode[tuple[int, int] | None]] = \
+            ActiveTEs()
+
+    @classmethod
+    def from_spans(cls, n: int,
+                   spans: Iterable[tuple[int, int, int]]) -> TEIndex:
+        """
+        Build an index for a genome of length n in O(a log a).
+
+        The spans are (te, start, length) for the active TEs, sorted by
+        start.
+        """
+        index = cls(n)
+        nodes = {}
+        node = index.sentinel
+        for te, start, length in spans:
+            index.tree.reweigh(node, start - index.tree.position(node))
+            node = index.tree.insert_after(node, n - start, (te, length))
+            nodes[te] = node
+        for te in sorted(nodes):  # active TEs are listed in id order
+            index.nodes[te] = nodes[te]
+        return index
+
+    def __contains__(self, te: object) -> bool:
+        """Check if te is an active TE."""
+        return te in self.nodes
+
+    def __len__(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.nodes)
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate through the active TEs in the order they were added."""
+        return iter(self.nodes)
+
+    def random(self, rng: RandomSource) -> int:
+        """Pick a random active TE."""
+        return self.nodes.random(rng)
+
+    def start(self, te: int) -> int:
+        """Get the position where te starts."""
+        return self.tree.position(self.nodes[te])
+
+    def length(self, te: int) -> int:
+        """Get the length of te."""
+        val = self.nodes[te].val
+        assert val is not None
+        return val[1]
+
+    def _before(self, pos: int) -> TreeNode[tuple[int, int] | None]:
+        """Get the node for the last TE that starts before pos."""
+        if pos <= 0:
+            return self.sentinel
+        if pos > self.tree.total:
+            last = self.tree.last()
+            assert last is not None
+            return last
+        node, _ = self.tree.locate(pos - 1)
+        return node
+
+    def hit(self, pos: int) -> int | None:
+        """
+        Get the TE that an insertion at pos collides with.
+
+        That is the TE that has start < pos <= end, if there is one.
+        """
+        node = self._before(pos)
+        if node.val is None:
+            return None
+        te, length = node.val
+        return te if pos <= self.tree.position(node) + length else None
+
+    def insert(self, pos: int, te: int, length: int) -> None:
+        """
+        Add te at pos, after inserting length nucleotides there.
+
+        Every TE that starts at pos or later moves length positions up.
+        """
+        before = self._before(pos)
+        gap = pos - self.tree.position(before)
+        rest = before.weight - gap
+        self.tree.reweigh(before, gap)
+        self.nodes[te] = self.tree.insert_after(before, rest + length,
+                                                (te, length))
+
+    def remove(self, te: int) -> tuple[int, int]:
+        """Remove te from the index and return its start and length."""
+        node = self.nodes.remove(te)
+        assert node.val is not None
+        start = self.tree.position(node)
+        before = self.tree.prev(node)
+        assert before is not None  # there is always the sentinel
+        self.tree.reweigh(before, before.weight + node.weight)
+        self.tree.remove(node)
+        return start, node.val[1]
+
+
+# Default chunk size when streaming genomes, see Genome.iter_chunks
+CHUNK_SIZE = 1 << 16
+
+# A run of nucleotides with the same annotation in a genome string
+_RUN = re.compile(r'-+|A+|x+')
+
+# Operation codes for Genome.apply_ops; the same values as simulate.Ops
+INSERT = 1   # (INSERT, pos, length)
+COPY = 2     # (COPY, te, offset)
+DISABLE = 3  # (DISABLE, te, anything)
+
+
+@dataclass
+class GenomeStats:
+    """Summary statistics for a genome."""
+
+    length: int                 # length of the genome
+    active: int                 # number of active TEs
+    disabled: int               # number of disabled TEs
+    te_lengths: dict[int, int]  # number of TEs (of either kind) by length
+    bp: dict[str, int]          # number of nucleotides by annotation
 
 
 #Example from Thomas Abstract Genome Class 
@@ -53,10 +544,52 @@ def insert_after(link: Link[T], val: T) -> None:
 class Genome(ABC):
     """Representation of a circular genome."""
 
+    # Whether inserting a TE moves all the nucleotides after it. Only
+    # used to estimate the work done by each operation when profiling.
+    SHIFTS = False
+
     def __init__(self, n: int):
-        """Create a genome of size n."""
-        ...  # not implemented yet
-        
+        """
+        Create a genome of size n.
+
+        Subclasses must call this. It sets up the counters for stats(),
+        which the subclasses keep up to date by calling _inserted() and
+        _disabled().
+        """
+        self.id = 0  # the last TE id handed out
+        self.te_lengths: Counter[int] = Counter()
+        self.te_bp = 0        # nucleotides in TEs, active or not
+        self.disabled_bp = 0  # nucleotides in disabled TEs
+        self.n_disabled = 0
+
+    def _inserted(self, length: int) -> None:
+        """Count a new TE of the given length."""
+        self.te_lengths[length] += 1
+        self.te_bp += length
+
+    def _disabled(self, length: int) -> None:
+        """Count a disabled TE of the given length."""
+        self.n_disabled += 1
+        self.disabled_bp += length
+
+    def stats(self) -> GenomeStats:
+        """
+        Get summary statistics for the genome.
+
+        The statistics are counted as TEs are inserted and disabled, so
+        this is O(number of distinct TE lengths) and doesn't look at the
+        nucleotides.
+        """
+        return GenomeStats(
+            length=len(self),
+            active=self.num_active(),
+            disabled=self.n_disabled,
+            te_lengths=dict(sorted(self.te_lengths.items())),
+            bp={'-': len(self) - self.te_bp,
+                'A': self.te_bp - self.disabled_bp,
+                'x': self.disabled_bp},
+        )
+
     @abstractmethod
     def insert_te(self, pos: int, length: int) -> int:
         """
@@ -106,6 +639,110 @@ class Genome(ABC):
         """Get the active TE IDs."""
         ...  # not implemented yet
 
+    def num_active(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.active_tes())
+
+    def random_active(self, rng: RandomSource) -> int:
+        """Pick a random active TE, using rng.random()."""
+        active = self.active_tes()
+        if not active:
+            raise IndexError("no active TEs")
+        return active[int(rng.random() * len(active))]
+
+    def sampling_order(self) -> list[int]:
+        """
+        Get the active TEs in the order random_active() picks from.
+
+        A genome rebuilt with from_runs() must get the same order back,
+        with set_sampling_order(), to make the same random choices.
+        """
+        return self.active_tes()
+
+    def set_sampling_order(self, order: list[int]) -> None:
+        """Restore the order from sampling_order()."""
+        assert order == self.active_tes()
+
+    @abstractmethod
+    def te_span(self, te: int) -> tuple[int, int]:
+        """Get the start and length of the active TE te."""
+        ...  # not implemented yet
+
+    def iter_runs(self) -> Iterator[tuple[str, int, int]]:
+        """
+        Run-length encode the genome.
+
+        Yields (char, length, te) for each run of nucleotides with the
+        same annotation, in order, where te is the TE id for active TEs
+        and 0 otherwise. Neighbouring active TEs are separate runs, and
+        active TEs of length 0 are runs of length 0 where they start.
+        """
+        spans = sorted((*self.te_span(te), te) for te in self.active_tes())
+        # TEs of length 0 have no nucleotides to find them by in the
+        # string, so we put them in where they start
+        empty = [(start, te) for start, length, te in spans if not length]
+        i = pos = 0
+        for char, length, te in self._string_runs(
+                iter([span for span in spans if span[1]])):
+            while i < len(empty) and empty[i][0] < pos + length:
+                # It starts in this run, which is not an active TE, or
+                # at its start
+                head = empty[i][0] - pos
+                if head:
+                    yield char, head, 0
+                    pos += head
+                    length -= head
+                yield 'A', 0, empty[i][1]
+                i += 1
+            yield char, length, te
+            pos += length
+        for _, te in empty[i:]:  # at the end of the genome
+            yield 'A', 0, te
+
+    def _string_runs(self, spans: Iterator[tuple[int, int, int]]
+                     ) -> Iterator[tuple[str, int, int]]:
+        """
+        Run-length encode the genome's string.
+
+        spans are the (start, length, te) of the active TEs with length
+        greater than 0, sorted by start.
+        """
+        char, length = '', 0
+        for chunk in self.iter_chunks():
+            for run in _RUN.finditer(chunk):
+                c, n = run.group()[0], run.end() - run.start()
+                if c == char:  # the run continues from the last chunk
+                    length += n
+                else:
+                    yield from self._split_run(char, length, spans)
+                    char, length = c, n
+        yield from self._split_run(char, length, spans)
+
+    @staticmethod
+    def _split_run(char: str, length: int,
+                   spans: Iterator[tuple[int, int, int]]
+                   ) -> Iterator[tuple[str, int, int]]:
+        """Split a run of 'A' into the TEs it consists of."""
+        if char != 'A':
+            if length:
+                yield char, length, 0
+            return
+        while length > 0:
+            _, te_length, te = next(spans)
+            yield 'A', te_length, te
+            length -= te_length
+
+    @classmethod
+    @abstractmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """
+        Build a genome from its runs, as given by iter_runs().
+
+        The genome's id is set to the largest TE id in the runs, and its
+        statistics counters are left at zero.
+        """
+        ...  # not implemented yet
+
     @abstractmethod
     def __len__(self) -> int:
         """Get the current length of the genome."""
@@ -126,19 +763,119 @@ class Genome(ABC):
         """
         ...  # not implemented yet
 
+    @abstractmethod
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """
+        Iterate through the string representation of the genome in chunks.
+
+        Every chunk has length size, except the last which may be shorter.
+        Joining the chunks gives the same string as str(genome), but
+        without ever holding all of it in memory.
+        """
+        ...  # not implemented yet
 
+    def close(self) -> None:
+        """
+        Release what the genome holds besides memory, such as files.
+
+        Most genomes hold nothing, so this does nothing. A genome can
+        also be used as a context manager, which closes it at the end.
+        """
+
+    def __enter__(self: G) -> G:
+        """Use the genome as a context manager."""
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        """Close the genome."""
+        self.close()
+
+    def write_to(self, out: IO[str], size: int = CHUNK_SIZE) -> None:
+        """Write the string representation of the genome to out."""
+        for chunk in self.iter_chunks(size):
+            out.write(chunk)
+
+    def apply_ops(self, ops: Iterable[tuple[int, int, int]] | Any
+                  ) -> list[int | None]:
+        """
+        Apply a batch of operations in order.
 
-class ListGenome(Genome):
+        Each operation is a record (op, a, b): (INSERT, pos, length),
+        (COPY, te, offset) or (DISABLE, te, _). A NumPy structured array
+        with three integer fields works as well. Returns what each
+        operation returns: the new TE id for INSERT and COPY (or None if
+        the copied TE wasn't active) and None for DISABLE.
+
+        The result is the same as calling the methods one at a time,
+        which is what this default does, but a genome can override it to
+        share work between the operations in a batch.
+        """
+        if hasattr(ops, 'tolist'):  # NumPy arrays; gives us Python ints
+            ops = ops.tolist()
+        results: list[int | None] = []
+        for op, a, b in ops:
+            if op == INSERT:
+                results.append(self.insert_te(a, b))
+            elif op == COPY:
+                results.append(self.copy_te(a, b))
+            elif op == DISABLE:
+                results.append(self.disable_te(a))
+            else:
+                raise ValueError(f"unknown operation {op}")
+        return results
+
+
+
+class TEIndexGenome(Genome):
+    """
+    A genome that keeps its active TEs in a TEIndex, self.te.
+
+    The index tracks where the TEs are as the genome changes, so
+    subclasses only have to store the nucleotides, and keep self.te up
+    to date with TEIndex.insert() and TEIndex.remove().
+    """
+
+    te: TEIndex
+
+    def active_tes(self) -> list[int]:
+        """Get the active TE IDs."""
+        return list(self.te)
+
+    def num_active(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.te)
+
+    def random_active(self, rng: RandomSource) -> int:
+        """Pick a random active TE, using rng.random()."""
+        return self.te.random(rng)
+
+    def sampling_order(self) -> list[int]:
+        """Get the active TEs in the order random_active() picks from."""
+        return list(self.te.nodes.dense)
+
+    def set_sampling_order(self, order: list[int]) -> None:
+        """Restore the order from sampling_order()."""
+        self.te.nodes.reorder(order)
+
+    def te_span(self, te: int) -> tuple[int, int]:
+        """Get the start and length of the active TE te."""
+        return self.te.start(te), self.te.length(te)
+
+
+class ListGenome(TEIndexGenome):
     """
     Representation of a genome.
     Implements the Genome interface using Python's built-in lists
     """
 
+    SHIFTS = True
+
     def __init__(self, n: int):
         """Create a new genome with length n."""
+        super().__init__(n)
         self.genome = ['-']*n # portion of genome that is not inactive or active TE is represented as "-"
                                 #accoring to line 124 in example abstract genome class 
-        self.te = dict() # self.te is a dictonary so we can store TE id as key, and map position and length to that id 
+        self.te = TEIndex(n) # self.te maps the id of each active TE to its position and length 
         self.id = 0 # the first id will be 0 
 
     def insert_te(self, pos: int, length: int) -> int:
@@ -152,28 +889,14 @@ class ListGenome(Genome):
         Returns a new ID for the transposable element.
         """
         self.id += 1 #reminder that self.id is the index number of transcriptional element, starts at 0 so first will be 1
-        self.te[self.id] = [pos, length] # new item in self.te dictionary at with the index [self.id]
-                                         # in index of self.if, [0] = pos, [1]= length (supplied in input of class)
-        key_list = list(self.te.keys()) # keys() is a built in python method (idea from Sara) that calls all the keys of a dictionary 
-        for key in key_list: # this for loop: 
-            #1. establishes where new te should go 
-            #2. checks to see if there is already a te there and converts it to inactive if so
-            #3. inserts the new te into the genome 
-            start = self.te[key][0] #see line 156
-            end = start + self.te[key][1] #see line 156
-
-            if start < pos <= end: # check to see if there is already a te in location where new te wants to go 
-                                   # this works because we havent reassined pos to the index of the new te yet. 
-                for i in range(start, end): # this loop changes preexisting te to inactive 
-                    self.genome[i] = 'x' 
-                del self.te[key] #we need to delete the key of the inactivated te from dictionary since there is a new te in that index on genome 
-
-            if pos < start: #this statement moves the 'x' features of old te to their new loccation 
-                new_start = start + length 
-                self.te[key][0] = new_start #because we deleted this value in line 169, need to update where old te is in dictionary  
-        transcriptional_element = ['A'] * length # assign new TE per assignment 
+        hit = self.te.hit(pos) # the TE with start < pos <= end, if there is one 
+        if hit is not None: 
+            self.disable_te(hit)
+        transcriptional_element = self._fill('A', length) # assign new TE per assignment 
         self.genome[pos:pos] = transcriptional_element #put in the new te we created in line above in correct place 
                                                         #(reminder pos is one of the inputs for class)
+        self.te.insert(pos, self.id, length) # this also moves the TEs after pos up by length 
+        self._inserted(length)
         return self.id #index number of new transcriptional element in genome 
 
     def copy_te(self, te: int, offset: int) -> int | None:
@@ -187,10 +910,10 @@ class ListGenome(Genome):
         wrap around, since the genome is circular.
         If te is not active, return None (and do not copy it).
         """
-        if te in self.te.keys(): # if input is in the dictionary (need to go through keys list to limit computational time) 
-            position = (self.te[te][0] + offset) % len(self) # from Sara and Laura, see line 156 but tbh im not sure how this works
+        if te in self.te: # if te is active 
+            position = (self.te.start(te) + offset) % len(self) # from Sara and Laura 
                                                       # position needs to be in terms of % len 
-            length = self.te[te][1] # see line 156
+            length = self.te.length(te)
             self.insert_te(position, length) #pos = p, length= l 
             return self.id
         else:
@@ -203,19 +926,12 @@ class ListGenome(Genome):
         TEs are already inactive, so there is no need to do anything
         for those.
         """
-        if te in self.te.keys(): #we are given te as an integer, it is the index number of the te,
-                                 #which is the key in our dictionary that maps to the position [0] and length [1]
-            start = self.te[te][0] 
-            end = start + self.te[te][1] 
-            for i in range(start, end): 
-                self.genome[i] = 'x' #x marks that it is inactivated 
-            del self.te[te]
+        if te in self.te: #we are given te as an integer, it is the index number of the te 
+            start, length = self.te.remove(te) 
+            self._disabled(length)
+            self.genome[start:start + length] = self._fill('x', length) #x marks that it is inactivated 
         return None
             
-    def active_tes(self) -> list[int]:
-        """Get the active TE IDs."""
-        return list(self.te.keys())  
-
     def __len__(self) -> int:
         """Current length of the genome."""
         return len(self.genome) 
@@ -232,6 +948,167 @@ class ListGenome(Genome):
         """
         return ''.join(self.genome) # easy to join lists into a string 
 
+    def apply_ops(self, ops: Iterable[tuple[int, int, int]] | Any
+                  ) -> list[int | None]:
+        """
+        Apply a batch of operations in order.
+
+        See Genome.apply_ops. Instead of shifting the list for every
+        insert, we only track TEs in self.te and where the new TEs go
+        relative to the old list while we run through the operations,
+        and then build the new list once at the end. That is
+        O(n + k log k) for k operations instead of O(k n).
+        """
+        if hasattr(ops, 'tolist'):
+            ops = ops.tolist()
+
+        # The genome we are building, as segments that are either a
+        # stretch of the old list (an int offset into it) or a new TE
+        # (its annotation character).
+        segments: SeqTree[int | str] = SeqTree()
+        if len(self.genome):
+            segments.insert_after(None, len(self.genome), 0)
+        new_tes: dict[int, TreeNode[int | str]] = {}
+        disabled: list[tuple[int, int]] = []  # ranges in the old list
+
+        def disable(te: int) -> None:
+            start, length = self.te.remove(te)
+            self._disabled(length)
+            node = new_tes.pop(te, None)
+            if node is not None:
+                node.val = 'x'
+            elif length:
+                # Active TEs are never split, so it is inside one segment
+                segment, offset = segments.locate(start)
+                assert isinstance(segment.val, int)
+                disabled.append((segment.val + offset, length))
+
+        results: list[int | None] = []
+        try:
+            for op, a, b in ops:
+                if op == COPY:
+                    if a not in self.te:
+                        results.append(None)
+                        continue
+                    op, a, b = INSERT, \
+                        (self.te.start(a) + b) % segments.total, \
+                        self.te.length(a)
+                if op == INSERT:
+                    pos, length = a, b
+                    self.id += 1
+                    hit = self.te.hit(pos)
+                    if hit is not None:
+                        disable(hit)
+                    if pos >= segments.total:
+                        before = segments.last()
+                    else:
+                        segment, offset = segments.locate(pos)
+                        if offset == 0:
+                            before = segments.prev(segment)
+                        else:
+                            val = segment.val
+                            tail = val + offset if isinstance(val, int) \
+                                else val
+                            segments.insert_after(segment,
+                                                  segment.weight - offset, tail)
+                            segments.reweigh(segment, offset)
+                            before = segment
+                    new_tes[self.id] = segments.insert_after(before, length,
+                                                             'A')
+                    self.te.insert(pos, self.id, length)
+                    self._inserted(length)
+                    results.append(self.id)
+                elif op == DISABLE:
+                    if a in self.te:
+                        disable(a)
+                    results.append(None)
+                else:
+                    raise ValueError(f"unknown operation {op}")
+        finally:
+            # Also when an operation fails, so the operations done so far
+            # leave the list in step with self.te
+            for start, length in disabled:
+                self.genome[start:start + length] = self._fill('x', length)
+            if segments.total != len(self.genome):  # there were inserts
+                old = self.genome
+                new = old[:0]
+                for segment in segments:
+                    if isinstance(segment.val, int):
+                        new += old[segment.val:segment.val + segment.weight]
+                    else:
+                        new += self._fill(segment.val, segment.weight)
+                self.genome = new
+        return results
+
+    @classmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """Build a genome from its runs, as given by iter_runs()."""
+        genome = cls(0)
+        assert isinstance(genome, ListGenome)
+        spans = []
+        pos = 0
+        for char, length, te in runs:
+            genome.genome += genome._fill(char, length)
+            if te:
+                spans.append((te, pos, length))
+            pos += length
+        genome.te = TEIndex.from_spans(pos, spans)
+        genome.id = max((te for te, _, _ in spans), default=0)
+        return genome
+
+    @staticmethod
+    def _fill(char: str, length: int) -> list[str]:
+        """Get length nucleotides annotated with char, for self.genome."""
+        return [char] * length
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Iterate through the string representation of the genome in chunks."""
+        for i in range(0, len(self.genome), size):
+            yield ''.join(self.genome[i:i + size])
+
+
+class ByteListGenome(ListGenome):
+    """
+    Representation of a genome.
+
+    Same as ListGenome, but the nucleotides are stored as one byte each
+    in a bytearray instead of a list of one-character strings. That
+    takes an eighth of the memory, inserting a TE is a memmove and
+    disabling one is a single slice assignment.
+    """
+
+    genome: bytearray  # type: ignore[assignment]
+
+    def __init__(self, n: int):
+        """Create a new genome with length n."""
+        Genome.__init__(self, n)
+        self.genome = bytearray(b'-') * n
+        self.te = TEIndex(n)
+        self.id = 0
+
+    @staticmethod
+    def _fill(char: str, length: int) -> bytes:  # type: ignore[override]
+        """Get length nucleotides annotated with char, for self.genome."""
+        return char.encode('ascii') * length
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+
+        Locations with no TE are '-', active TEs 'A', and disabled TEs 'x'.
+        """
+        return self.genome.decode('ascii')
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Iterate through the string representation of the genome in chunks."""
+        view = memoryview(self.genome)
+        try:
+            for i in range(0, len(view), size):
+                yield str(view[i:i + size], 'ascii')
+        finally:
+            # Let go of the buffer so the genome can be resized again
+            view.release()
+
 
 #Initial class copied from https://github.com/birc-ctib-2022/doubly-linked-lists-tessdiv 
 #and from https://github.com/birc-ctib-2022/doubly-linked-lists-tessdiv/blob/main/src/lists.py
@@ -246,9 +1123,15 @@ class DLList(Generic[T]):
     >>> x = DLList([1, 2, 3, 4])
     >>> print(x)
     [1, 2, 3, 4]
+    >>> len(x)
+    4
+
+    The list keeps count of its links, so len() is O(1), but only
+    if links are added through the list's own methods.
     """
 
     head: Link[T]  # Dummy head link
+    size: int      # Number of links, not counting head
 
     def __init__(self, seq: Iterable[T] = ()):
         """Create a new circular list from a sequence."""
@@ -260,12 +1143,49 @@ class DLList(Generic[T]):
         self.head = Link(None, None, None)  # type: ignore
         self.head.prev = self.head
         self.head.next = self.head
+        self.size = 0
 
-        # Add elements to the list, exploiting that self.head.prev
-        # is the last element in the list, so appending means inserting
-        # after that link.
-        for val in seq:
-            insert_after(self.head.prev, val)
+        self.insert_many_after(self.head, seq)
+
+    def insert_after(self, link: Link[T], val: T) -> Link[T]:
+        """
+        Add a new link containing val after link, which must be in the list.
+
+        Returns the new link.
+        """
+        self.size += 1
+        return insert_after(link, val)
+
+    def insert_many_after(self, link: Link[T], vals: Iterable[T]) -> Link[T]:
+        """
+        Add new links containing vals, in order, after link.
+
+        Returns the last new link, or link if vals is empty. This is the
+        same as calling insert_after() for each value, but the links are
+        chained up in one loop without a function call per link.
+        """
+        after = link.next
+        count = 0
+        for val in vals:
+            link.next = link = Link(val, link, after)
+            count += 1
+        after.prev = link
+        self.size += count
+        return link
+
+    def __len__(self) -> int:
+        """Get the number of elements in the list."""
+        return self.size
+
+    def check(self) -> None:
+        """Check that the size counter matches the links; O(n)."""
+        count = 0
+        link = self.head.next
+        while link is not self.head:
+            assert link.next.prev is link, "broken prev pointer"
+            count += 1
+            link = link.next
+        assert count == self.size, f"size is {self.size} but found {count}"
 
     def __str__(self) -> str:
         """Get string with the elements going in the next direction."""
@@ -277,17 +1197,94 @@ class DLList(Generic[T]):
         return f"[{', '.join(elms)}]"
     __repr__ = __str__  # because why not?
 
-class LinkedListGenome(Genome):
+class LinkedListGenome(TEIndexGenome):
     """
     Representation of a genome.
     Implements the Genome interface using linked lists.
+
+    On top of the links we keep an index, a SeqTree over blocks of at
+    most BLOCK consecutive links, so we can find the link at a position
+    in O(log n + BLOCK) instead of walking from the head.
     """
+
+    BLOCK = 64  # max links per block in the positional index
+
+    # Set to True to check the list and the index against each other
+    # after every operation. That costs O(n) per operation, so it is
+    # for debugging only.
+    debug = False
+
 #COMMENTS ARE WHERE IMPLEMENTATION IS DIFFERENT FROM LISTS 
     def __init__(self, n: int):
         """Create a new genome with length n."""
-        self.genome = DLList(['-']*n) # use DLList __init__ from exercises 
-        self.te = dict() 
+        super().__init__(n)
+        self.genome = DLList(repeat('-', n)) # use DLList __init__ from exercises 
+        self.te = TEIndex(n) 
         self.id = 0 
+        self._build_index()
+
+    def _build_index(self) -> None:
+        """Build the positional index over the links in self.genome."""
+        # Each block in the index holds the first link of the block and
+        # has the number of links in it as its weight
+        self.index: SeqTree[Link[str]] = SeqTree()
+        block = None
+        n = len(self.genome)
+        link = self.genome.head.next
+        while link is not self.genome.head:
+            size = min(self.BLOCK, n)
+            block = self.index.insert_after(block, size, link)
+            for _ in range(size):
+                link = link.next
+            n -= size
+
+    @classmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """Build a genome from its runs, as given by iter_runs()."""
+        genome = cls(0)
+        assert isinstance(genome, LinkedListGenome)
+        spans = []
+        pos = 0
+        link = genome.genome.head
+        for char, length, te in runs:
+            link = genome.genome.insert_many_after(link, repeat(char, length))
+            if te:
+                spans.append((te, pos, length))
+            pos += length
+        genome._build_index()
+        genome.te = TEIndex.from_spans(pos, spans)
+        genome.id = max((te for te, _, _ in spans), default=0)
+        return genome
+
+    def _link_at(self, pos: int) -> Link[str]:
+        """Get the link at position pos, or the head if pos is -1."""
+        if pos < 0:
+            return self.genome.head
+        block, offset = self.index.locate(pos)
+        link = block.val
+        for _ in range(offset):
+            link = link.next
+        return link
+
+    def _block_before(self, pos: int) -> TreeNode[Link[str]] | None:
+        """
+        Get the index block that ends just before pos.
+
+        If pos is inside a block, the block is split in two so there
+        is a block boundary at pos.
+        """
+        if pos >= self.index.total:
+            return self.index.last()
+        block, offset = self.index.locate(pos)
+        if offset == 0:
+            return self.index.prev(block)
+        link = block.val
+        for _ in range(offset):
+            link = link.next
+        tail = block.weight - offset
+        self.index.reweigh(block, offset)
+        self.index.insert_after(block, tail, link)
+        return block
 
     def insert_te(self, pos: int, length: int) -> int:
         """
@@ -300,27 +1297,23 @@ class LinkedListGenome(Genome):
         Returns a new ID for the transposable element.
         """
         self.id += 1 
-        self.te[self.id] = [pos, length] 
-        key_list = list(self.te.keys()) 
-        for key in key_list: 
-            start = self.te[key][0] 
-            end = start + self.te[key][1] 
-            if start < pos <= end: 
-                self.disable_te(key)
-            if pos < start:
-                new_start = start + length 
-                self.te[key][0] = new_start 
-        te = DLList(['A'] * length) #new te needs to be made of 'A' per assignment, note how its made with DLL class 
-        link_start = self.genome.head #reminder .head is first element 
-        i = 0 
-        while i < start: 
-            link_start = link_start.next 
-            i += 1
-        link_e = link_start.next 
-        link_start.next = te.head.next
-        te.head.next.prev = link_start
-        link_e.prev = te.head.prev
-        te.head.prev.next = link_e
+        hit = self.te.hit(pos) 
+        if hit is not None: 
+            self.disable_te(hit)
+
+        # Splice the new links in after the link at pos - 1, and add
+        # blocks for them to the index
+        link = self._link_at(pos - 1)
+        block = self._block_before(pos)
+        for i in range(0, length, self.BLOCK):
+            size = min(self.BLOCK, length - i)
+            last = self.genome.insert_many_after(link, repeat('A', size))
+            block = self.index.insert_after(block, size, link.next)
+            link = last
+        self.te.insert(pos, self.id, length) 
+        self._inserted(length)
+        if self.debug:
+            self._check()
         return self.id 
 
     def copy_te(self, te: int, offset: int) -> int | None:
@@ -334,11 +1327,10 @@ class LinkedListGenome(Genome):
         wrap around, since the genome is circular.
         If te is not active, return None (and do not copy it).
         """
-        if te in self.te.keys(): 
-            start = self.te[te][0] 
-            length = self.te[te][1] 
-            offset = offset % len(self) 
-            te_start = start + offset
+        if te in self.te: 
+            start = self.te.start(te) 
+            length = self.te.length(te) 
+            te_start = (start + offset) % len(self)
             self.insert_te(te_start, length)
             return self.id
         return None
@@ -350,56 +1342,729 @@ class LinkedListGenome(Genome):
         TEs are already inactive, so there is no need to do anything
         for those.
         """
-    
-        if te in self.te.keys(): 
-            start = self.te[te][0] 
-            length = self.te[te][1] 
-            disabled_te = DLList(['x']*length) #make a doubly-linked list for the te to be disabled 
-            link_start = self.genome.head 
-            i = 0 
-            while i < start: 
-                link_start = link_start.next 
-                i += 1
-            link_end = link_start 
-            j = 0
-            while j <= length:
-                link_end = link_end.next 
-                j += 1
-            
-            link_start.next = disabled_te.head.next
-            disabled_te.head.prev.next = link_end
-            link_end.prev = disabled_te.head.prev
-            disabled_te.head.next.prev = link_start
-            del self.te[te] 
+        if te in self.te: 
+            start, length = self.te.remove(te) 
+            self._disabled(length)
+            # Relabel the links in place, so the index stays valid. Start
+            # from the link before, which exists even for a TE of length
+            # 0 at the end of the genome.
+            link = self._link_at(start - 1)
+            for _ in range(length):
+                link = link.next
+                link.val = 'x'
+            if self.debug:
+                self._check()
         return None
 
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return len(self.genome)
+
+    def _check(self) -> None:
+        """Check the genome's invariants; O(n)."""
+        self.genome.check()
+        assert self.index.total == len(self.genome), \
+            "index and list disagree on the length"
+        assert self.te.tree.total == len(self.genome), \
+            "TE index and list disagree on the length"
+        link = self.genome.head.next
+        for block in self.index:
+            assert block.val is link, "block does not start at its link"
+            for _ in range(block.weight):
+                link = link.next
+        assert link is self.genome.head, "index does not cover the list"
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+        Create a string that represents the genome. By nature, it will be
+        linear, but imagine that the last character is immidiatetly followed
+        by the first.
+        The genome should start at position 0. Locations with no TE should be
+        represented with the character '-', active TEs with 'A', and disabled
+        TEs with 'x'.
+        """
+        return ''.join(self.iter_chunks())
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Iterate through the string representation of the genome in chunks."""
+        # Collect the links' values in a list and join them once per
+        # chunk, instead of growing a string one character at a time
+        elms: list[str] = []
+        link = self.genome.head.next
+        while link is not self.genome.head:
+            elms.append(link.val)
+            if len(elms) == size:
+                yield ''.join(elms)
+                elms = []
+            link = link.next
+        if elms:
+            yield ''.join(elms)
+
+
+class RangeGenome(Genome):
+    """
+    Representation of a genome.
+
+    Implements the Genome interface by keeping track of runs of
+    nucleotides with the same annotation instead of the individual
+    nucleotides. The runs sit in a SeqTree, so finding the run at a
+    position, or the position of a run, takes O(log r) for r runs.
+
+    An active TE is always a single run: inserting inside it disables
+    it first, so it is never split while it is active.
+    """
+
+    def __init__(self, n: int):
+        """Create a new genome with length n."""
+        super().__init__(n)
+        # Every run is the annotation character and, for active TEs,
+        # the TE id.
+        self.runs: SeqTree[tuple[str, int | None]] = SeqTree()
+        if n > 0:
+            self.runs.insert_after(None, n, ('-', None))
+        self.te: ActiveTEs[TreeNode[tuple[str, int | None]]] = ActiveTEs()
+        self.id = 0
+
+    def insert_te(self, pos: int, length: int) -> int:
+        """
+        Insert a new transposable element.
+
+        Insert a new transposable element at position pos and len
+        nucleotide forward.
+
+        If the TE collides with an existing TE, i.e. genome[pos]
+        already contains TEs, then that TE should be disabled and
+        removed from the set of active TEs.
+
+        Returns a new ID for the transposable element.
+        """
+        self.id += 1
+        # Same collision rule as the list genomes: a TE is hit if
+        # start < pos <= end, i.e., if it covers the nucleotide at pos - 1.
+        if pos > 0:
+            run, _ = self.runs.locate(pos - 1)
+            char, te = run.val
+            if char == 'A':
+                assert te is not None
+                self.disable_te(te)
+
+        if pos >= self.runs.total:
+            before = self.runs.last()
+        else:
+            run, offset = self.runs.locate(pos)
+            if offset == 0:
+                before = self.runs.prev(run)
+            else:
+                # Split the run so the TE goes between the two halves
+                tail = run.weight - offset
+                self.runs.reweigh(run, offset)
+                self.runs.insert_after(run, tail, run.val)
+                before = run
+
+        self.te[self.id] = \
+            self.runs.insert_after(before, length, ('A', self.id))
+        self._inserted(length)
+        return self.id
+
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """
+        Copy a transposable element.
+
+        Copy the transposable element te to an offset from its current
+        location.
+
+        The offset can be positive or negative; if positive the te is copied
+        upwards and if negative it is copied downwards. If the offset moves
+        the copy left of index 0 or right of the largest index, it should
+        wrap around, since the genome is circular.
+
+        If te is not active, return None (and do not copy it).
+        """
+        run = self.te.get(te)
+        if run is None:
+            return None
+        pos = (self.runs.position(run) + offset) % len(self)
+        return self.insert_te(pos, run.weight)
+
+    def disable_te(self, te: int) -> None:
+        """
+        Disable a TE.
+
+        If te is an active TE, then make it inactive. Inactive
+        TEs are already inactive, so there is no need to do anything
+        for those.
+        """
+        run = self.te.pop(te, None)
+        if run is None:
+            return
+        self._disabled(run.weight)
+        run.val = ('x', None)
+        # Merge with disabled neighbours to keep the number of runs down
+        for neighbour in (self.runs.prev(run), self.runs.next(run)):
+            if neighbour and neighbour.val[0] == 'x':
+                self.runs.remove(neighbour)
+                self.runs.reweigh(run, run.weight + neighbour.weight)
+
     def active_tes(self) -> list[int]:
         """Get the active TE IDs."""
-        return list(self.te.keys())  
+        return list(self.te)
+
+    def num_active(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.te)
+
+    def random_active(self, rng: RandomSource) -> int:
+        """Pick a random active TE, using rng.random()."""
+        return self.te.random(rng)
+
+    def sampling_order(self) -> list[int]:
+        """Get the active TEs in the order random_active() picks from."""
+        return list(self.te.dense)
+
+    def set_sampling_order(self, order: list[int]) -> None:
+        """Restore the order from sampling_order()."""
+        self.te.reorder(order)
+
+    def te_span(self, te: int) -> tuple[int, int]:
+        """Get the start and length of the active TE te."""
+        run = self.te[te]
+        return self.runs.position(run), run.weight
+
+    def iter_runs(self) -> Iterator[tuple[str, int, int]]:
+        """Run-length encode the genome; see Genome.iter_runs."""
+        for run in self.runs:
+            char, te = run.val
+            yield char, run.weight, te or 0
+
+    @classmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """Build a genome from its runs, as given by iter_runs()."""
+        genome = cls(0)
+        assert isinstance(genome, RangeGenome)
+        node = None
+        tes = {}
+        for char, length, te in runs:
+            if char != 'A' and node and node.val[0] == char:
+                genome.runs.reweigh(node, node.weight + length)
+                continue
+            node = genome.runs.insert_after(node, length, (char, te or None))
+            if char == 'A':
+                tes[te] = node
+        for te in sorted(tes):
+            genome.te[te] = tes[te]
+        genome.id = max(tes, default=0)
+        return genome
 
     def __len__(self) -> int:
         """Current length of the genome."""
-        #more complicated because can only use len() method for simple list 
-        length = 0 # new variable, begin with 0 
-        link = self.genome.head.next #self.genome.head will be the same as self.genome.head.next when DLL is empty
-        while link and link is not self.genome.head: 
-            length += 1 # similar to initial lists exercise 
-            link = link.next # link in this case functions kind of like an accumulator 
-        return length 
+        return self.runs.total
 
     def __str__(self) -> str:
         """
         Return a string representation of the genome.
+
         Create a string that represents the genome. By nature, it will be
         linear, but imagine that the last character is immidiatetly followed
         by the first.
+
         The genome should start at position 0. Locations with no TE should be
         represented with the character '-', active TEs with 'A', and disabled
         TEs with 'x'.
         """
-        elms: str = ''
-        link = self.genome.head.next
-        while link and link is not self.genome.head:
-            elms += (str(link.val))
-            link = link.next
-        return elms 
\ No newline at end of file
+        return ''.join(run.val[0] * run.weight for run in self.runs)
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Iterate through the string representation of the genome in chunks."""
+        parts: list[str] = []
+        filled = 0
+        for run in self.runs:
+            left = run.weight
+            while left:
+                take = min(left, size - filled)
+                parts.append(run.val[0] * take)
+                filled += take
+                left -= take
+                if filled == size:
+                    yield ''.join(parts)
+                    parts = []
+                    filled = 0
+        if parts:
+            yield ''.join(parts)
+
+
+class RopeGenome(TEIndexGenome):
+    """
+    Representation of a genome.
+
+    Implements the Genome interface with a rope: the nucleotides are
+    stored one byte each, as in ByteListGenome, but in leaves of at most
+    LEAF bytes that sit in a SeqTree, so finding the leaf at a position
+    takes O(log n). Inserting a TE only changes the leaf it goes into,
+    which is split if it gets too big, so an insert costs
+    O(log n + LEAF + length) instead of the O(n) shift of the lists.
+    The active TEs are kept in a TEIndex, as for the list genomes.
+    """
+
+    LEAF = 4096  # max nucleotides in a leaf
+
+    def __init__(self, n: int):
+        """Create a new genome with length n."""
+        super().__init__(n)
+        self.leaves: SeqTree[bytearray] = SeqTree()
+        node = None
+        for start in range(0, n, self.LEAF):
+            size = min(self.LEAF, n - start)
+            node = self.leaves.insert_after(node, size, bytearray(b'-') * size)
+        self.te = TEIndex(n)
+        self.id = 0
+
+    def _splice(self, pos: int, data: bytes) -> None:
+        """Insert data at pos, splitting the leaf there if it gets too big."""
+        if not self.leaves.root:
+            self.leaves.insert_after(None, len(data), bytearray(data))
+            return
+        if pos >= self.leaves.total:
+            leaf = self.leaves.last()
+            assert leaf is not None
+            offset = leaf.weight
+        else:
+            leaf, offset = self.leaves.locate(pos)
+        buf = leaf.val
+        buf[offset:offset] = data
+        if len(buf) <= self.LEAF:
+            self.leaves.reweigh(leaf, len(buf))
+            return
+        # Split the leaf into pieces of the same size, all of them
+        # between LEAF / 2 and LEAF, so no leaf gets too small.
+        pieces = -(-len(buf) // self.LEAF)
+        size = -(-len(buf) // pieces)
+        leaf.val = buf[:size]
+        self.leaves.reweigh(leaf, size)
+        for start in range(size, len(buf), size):
+            piece = buf[start:start + size]
+            leaf = self.leaves.insert_after(leaf, len(piece), piece)
+
+    def insert_te(self, pos: int, length: int) -> int:
+        """
+        Insert a new transposable element.
+
+        Insert a new transposable element at position pos and len
+        nucleotide forward.
+
+        If the TE collides with an existing TE, i.e. genome[pos]
+        already contains TEs, then that TE should be disabled and
+        removed from the set of active TEs.
+
+        Returns a new ID for the transposable element.
+        """
+        self.id += 1
+        hit = self.te.hit(pos)
+        if hit is not None:
+            self.disable_te(hit)
+        self._splice(pos, b'A' * length)
+        self.te.insert(pos, self.id, length)
+        self._inserted(length)
+        return self.id
+
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """
+        Copy a transposable element.
+
+        Copy the transposable element te to an offset from its current
+        location.
+
+        The offset can be positive or negative; if positive the te is copied
+        upwards and if negative it is copied downwards. If the offset moves
+        the copy left of index 0 or right of the largest index, it should
+        wrap around, since the genome is circular.
+
+        If te is not active, return None (and do not copy it).
+        """
+        if te not in self.te:
+            return None
+        pos = (self.te.start(te) + offset) % len(self)
+        return self.insert_te(pos, self.te.length(te))
+
+    def disable_te(self, te: int) -> None:
+        """
+        Disable a TE.
+
+        If te is an active TE, then make it inactive. Inactive
+        TEs are already inactive, so there is no need to do anything
+        for those.
+        """
+        if te not in self.te:
+            return
+        start, length = self.te.remove(te)
+        self._disabled(length)
+        if not length:
+            return
+        # The TE can span several leaves; relabel it a leaf at a time.
+        leaf: TreeNode[bytearray] | None
+        leaf, offset = self.leaves.locate(start)
+        while length:
+            assert leaf is not None
+            take = min(length, leaf.weight - offset)
+            leaf.val[offset:offset + take] = b'x' * take
+            length -= take
+            leaf, offset = self.leaves.next(leaf), 0
+
+    @classmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """Build a genome from its runs, as given by iter_runs()."""
+        genome = cls(0)
+        assert isinstance(genome, RopeGenome)
+        leaf = None
+        buf = bytearray()
+        spans = []
+        pos = 0
+        for char, length, te in runs:
+            if te:
+                spans.append((te, pos, length))
+            pos += length
+            while length:
+                take = min(length, genome.LEAF - len(buf))
+                buf += char.encode('ascii') * take
+                length -= take
+                if len(buf) == genome.LEAF:
+                    leaf = genome.leaves.insert_after(leaf, len(buf), buf)
+                    buf = bytearray()
+        if buf:
+            genome.leaves.insert_after(leaf, len(buf), buf)
+        genome.te = TEIndex.from_spans(pos, spans)
+        genome.id = max((te for te, _, _ in spans), default=0)
+        return genome
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return self.leaves.total
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+
+        Create a string that represents the genome. By nature, it will be
+        linear, but imagine that the last character is immidiatetly followed
+        by the first.
+
+        The genome should start at position 0. Locations with no TE should be
+        represented with the character '-', active TEs with 'A', and disabled
+        TEs with 'x'.
+        """
+        return b''.join(leaf.val for leaf in self.leaves).decode('ascii')
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Iterate through the string representation of the genome in chunks."""
+        parts: list[bytearray] = []
+        filled = 0
+        for leaf in self.leaves:
+            start = 0
+            while start < leaf.weight:
+                take = min(leaf.weight - start, size - filled)
+                parts.append(leaf.val[start:start + take])
+                filled += take
+                start += take
+                if filled == size:
+                    yield b''.join(parts).decode('ascii')
+                    parts = []
+                    filled = 0
+        if parts:
+            yield b''.join(parts).decode('ascii')
+
+
+def _close_all(*files: Any) -> None:
+    """Close the files, for MmapGenome's finalizer."""
+    for f in files:
+        f.close()
+
+
+class MmapGenome(Genome):
+    """
+    Representation of a genome.
+
+    Implements the Genome interface for genomes bigger than memory.
+    The nucleotides are stored one byte each in a memory-mapped file,
+    and the genome is a piece table over the file: a SeqTree of pieces,
+    each a stretch of the file, so finding the piece at a position takes
+    O(log p) for p pieces. The file is only ever appended to; inserting
+    a TE writes it at the end of the file and splits the piece at pos,
+    and disabling a TE overwrites its bytes in place. Memory use is
+    O(p), which grows with the number of operations but not with n.
+
+    Nucleotides with no TE are stored as zero bytes, so the initial
+    genome is a hole in a sparse file, which costs neither time nor disk
+    space, and they are turned into '-' when the genome is read.
+
+    The file is an anonymous temporary file in `directory` (the
+    system's default if None), so set that to somewhere with room for
+    the genome. Close the genome, or use it in a with statement, to
+    delete the file; otherwise that happens when it is garbage
+    collected.
+    """
+
+    directory: str | None = None
+
+    # What the bytes in the file mean
+    _DECODE = bytes.maketrans(b'\0', b'-')
+
+    def __init__(self, n: int):
+        """Create a new genome with length n."""
+        import tempfile  # not at the top; it is slow to import
+        super().__init__(n)
+        self.file = tempfile.TemporaryFile(dir=self.directory)
+        self.end = 0  # where the next bytes go in the file
+        self.map = self._grow(max(n, CHUNK_SIZE))
+        self._finalizer = weakref.finalize(self, _close_all,
+                                           self.map, self.file)
+        # Every piece is its offset in the file, the character all its
+        # nucleotides are, and the TE id for active TEs (0 otherwise),
+        # so the pieces are the genome's runs without reading the file.
+        self.pieces: SeqTree[tuple[int, str, int]] = SeqTree()
+        if n > 0:
+            self.pieces.insert_after(None, n, (self._append(None, n), '-', 0))
+        self.te: ActiveTEs[TreeNode[tuple[int, str, int]]] = ActiveTEs()
+        self.id = 0
+
+    def _grow(self, size: int) -> mmap.mmap:
+        """Make the file (at least) size bytes and map all of it."""
+        self.file.truncate(size)  # extending leaves a hole of zeros
+        return mmap.mmap(self.file.fileno(), size)
+
+    def _write(self, offset: int, char: str, length: int) -> None:
+        """Write length copies of char at offset in the file."""
+        for start in range(offset, offset + length, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, offset + length - start)
+            self.map[start:start + size] = char.encode('ascii') * size
+
+    def _append(self, char: str | None, length: int) -> int:
+        """
+        Add length nucleotides to the end of the file.
+
+        The nucleotides are char, or no TE if char is None. Returns the
+        offset of the first one.
+        """
+        offset = self.end
+        self.end += length
+        if self.end > len(self.map):
+            size = max(self.end, 2 * len(self.map))
+            self.map.close()
+            self.map = self._grow(size)
+            self._finalizer.detach()
+            self._finalizer = weakref.finalize(self, _close_all,
+                                               self.map, self.file)
+        if char is not None:
+            self._write(offset, char, length)
+        return offset
+
+    def close(self) -> None:
+        """Close and delete the file; the genome can't be used after."""
+        self._finalizer()
+
+    def insert_te(self, pos: int, length: int) -> int:
+        """
+        Insert a new transposable element.
+
+        Insert a new transposable element at position pos and len
+        nucleotide forward.
+
+        If the TE collides with an existing TE, i.e. genome[pos]
+        already contains TEs, then that TE should be disabled and
+        removed from the set of active TEs.
+
+        Returns a new ID for the transposable element.
+        """
+        self.id += 1
+        # Same collision rule as the other genomes: a TE is hit if
+        # start < pos <= end, i.e., if it covers the nucleotide at pos - 1.
+        if pos > 0:
+            piece, _ = self.pieces.locate(pos - 1)
+            te = piece.val[2]
+            if te:
+                self.disable_te(te)
+
+        if pos >= self.pieces.total:
+            before = self.pieces.last()
+        else:
+            piece, offset = self.pieces.locate(pos)
+            if offset == 0:
+                before = self.pieces.prev(piece)
+            else:
+                # Split the piece so the TE goes between the two halves.
+                # Active TEs are never split; the collision disabled it.
+                start, char, te = piece.val
+                assert not te
+                tail = piece.weight - offset
+                self.pieces.reweigh(piece, offset)
+                self.pieces.insert_after(piece, tail,
+                                         (start + offset, char, 0))
+                before = piece
+
+        self.te[self.id] = self.pieces.insert_after(
+            before, length, (self._append('A', length), 'A', self.id)
+        )
+        self._inserted(length)
+        return self.id
+
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """
+        Copy a transposable element.
+
+        Copy the transposable element te to an offset from its current
+        location.
+
+        The offset can be positive or negative; if positive the te is copied
+        upwards and if negative it is copied downwards. If the offset moves
+        the copy left of index 0 or right of the largest index, it should
+        wrap around, since the genome is circular.
+
+        If te is not active, return None (and do not copy it).
+        """
+        piece = self.te.get(te)
+        if piece is None:
+            return None
+        pos = (self.pieces.position(piece) + offset) % len(self)
+        return self.insert_te(pos, piece.weight)
+
+    def disable_te(self, te: int) -> None:
+        """
+        Disable a TE.
+
+        If te is an active TE, then make it inactive. Inactive
+        TEs are already inactive, so there is no need to do anything
+        for those.
+        """
+        piece = self.te.pop(te, None)
+        if piece is None:
+            return
+        self._disabled(piece.weight)
+        start, _, _ = piece.val
+        self._write(start, 'x', piece.weight)
+        piece.val = (start, 'x', 0)
+
+    def active_tes(self) -> list[int]:
+        """Get the active TE IDs."""
+        return list(self.te)
+
+    def num_active(self) -> int:
+        """Get the number of active TEs."""
+        return len(self.te)
+
+    def random_active(self, rng: RandomSource) -> int:
+        """Pick a random active TE, using rng.random()."""
+        return self.te.random(rng)
+
+    def sampling_order(self) -> list[int]:
+        """Get the active TEs in the order random_active() picks from."""
+        return list(self.te.dense)
+
+    def set_sampling_order(self, order: list[int]) -> None:
+        """Restore the order from sampling_order()."""
+        self.te.reorder(order)
+
+    def te_span(self, te: int) -> tuple[int, int]:
+        """Get the start and length of the active TE te."""
+        piece = self.te[te]
+        return self.pieces.position(piece), piece.weight
+
+    def iter_runs(self) -> Iterator[tuple[str, int, int]]:
+        """
+        Run-length encode the genome; see Genome.iter_runs.
+
+        The runs come from the pieces, so the file isn't read.
+        """
+        char, length = '', 0
+        for piece in self.pieces:
+            _, c, te = piece.val
+            if not te and not piece.weight:
+                continue  # a disabled TE of length 0
+            if te or c != char:
+                if length:
+                    yield char, length, 0
+                char, length = c, 0
+            if te:
+                yield c, piece.weight, te
+            else:
+                length += piece.weight
+        if length:
+            yield char, length, 0
+
+    @classmethod
+    def from_runs(cls: type[G], runs: Iterable[tuple[str, int, int]]) -> G:
+        """Build a genome from its runs, as given by iter_runs()."""
+        genome = cls(0)
+        assert isinstance(genome, MmapGenome)
+        piece = None
+        tes = {}
+        for char, length, te in runs:
+            offset = genome._append(None if char == '-' else char, length)
+            if not te and piece and piece.val[1:] == (char, 0) and \
+                    piece.val[0] + piece.weight == offset:
+                # It follows on from the last piece in the file too
+                genome.pieces.reweigh(piece, piece.weight + length)
+                continue
+            piece = genome.pieces.insert_after(piece, length,
+                                               (offset, char, te))
+            if te:
+                tes[te] = piece
+        for te in sorted(tes):
+            genome.te[te] = tes[te]
+        genome.id = max(tes, default=0)
+        return genome
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return self.pieces.total
+
+    def __str__(self) -> str:
+        """
+        Return a string representation of the genome.
+
+        Create a string that represents the genome. By nature, it will be
+        linear, but imagine that the last character is immidiatetly followed
+        by the first.
+
+        The genome should start at position 0. Locations with no TE should be
+        represented with the character '-', active TEs with 'A', and disabled
+        TEs with 'x'.
+        """
+        return ''.join(self.iter_chunks())
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """
+        Iterate through the string representation of the genome in chunks.
+
+        Only a chunk is in memory at a time, so use this, or write_to(),
+        to export genomes bigger than memory.
+        """
+        parts: list[bytes] = []
+        filled = 0
+        for piece in self.pieces:
+            offset, _, _ = piece.val
+            end = offset + piece.weight
+            while offset < end:
+                take = min(end - offset, size - filled)
+                # Read with pread rather than through the map, so the
+                # pages we have read don't stay in our memory
+                parts.append(os.pread(self.file.fileno(), take, offset))
+                filled += take
+                offset += take
+                if filled == size:
+                    yield b''.join(parts).translate(self._DECODE) \
+                        .decode('ascii')
+                    parts = []
+                    filled = 0
+        if parts:
+            yield b''.join(parts).translate(self._DECODE).decode('ascii')
+
+
+# The implementations, by the names used on the command line of the
+# benchmarks and fuzzer.
+BACKENDS: dict[str, type[Genome]] = {
+    'list': ListGenome,
+    'bytelist': ByteListGenome,
+    'linked': LinkedListGenome,
+    'range': RangeGenome,
+    'rope': RopeGenome,
+    'mmap': MmapGenome,
+}
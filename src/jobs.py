@@ -0,0 +1,88 @@
+"""Run many simulations from one process.
+
+Starting Python, and importing NumPy in particular, can take longer
+than a small simulation. This runs any number of simulations, given
+as JSON objects one per line, in a single process:
+
+    python3 src/jobs.py jobs.jsonl > results.jsonl
+
+Each job has n and k, and optionally seed, te_len, te_offset, weights,
+backend (a name from genome.BACKENDS), rng ('python' or 'numpy'),
+stats (true to get summary statistics instead of the genome) and out
+(a file to write the genome to). Options on the command line are the
+defaults for the jobs. For each job, a JSON object is written to
+stdout with the job's number and the genome, its statistics, or the
+file it was written to.
+
+The default sampler is the pure Python one, so NumPy is only imported
+by jobs that ask for it; the sequences are different from the ones
+sim_te makes by default, which uses NumPy.
+
+>>> import io
+>>> jobs = '{"n": 30, "k": 10, "seed": 3, "te_len": 10}\\n'
+>>> main([], io.StringIO(jobs))
+{"job": 0, "genome": "-AAAAAAAAAAAAAAAAAAAA------xxxxxxxxxx---------xxxxxxxxxx--x------------xxxxxxx"}
+>>> main(['--stats'], io.StringIO(jobs + jobs))  # doctest: +ELLIPSIS
+{"job": 0, "stats": {"length": 78, "active": 1, "disabled": 5, ...}}
+{"job": 1, "stats": {"length": 78, "active": 1, "disabled": 5, ...}}
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import sys
+from dataclasses import asdict
+from typing import IO, Any
+
+from genome import BACKENDS
+from simulate import SAMPLERS, SimParams, sim_stats, sim_te
+
+
+def run_job(job: dict[str, Any]) -> dict[str, Any]:
+    """Run a single job and return the result for it."""
+    theta = SimParams(
+        te_len=job.get('te_len', SimParams.te_len),
+        te_offset=job.get('te_offset', SimParams.te_offset),
+        weights=tuple(job.get('weights', SimParams.weights)),
+    )
+    kwargs = dict(theta=theta, seed=job.get('seed'),
+                  genome_class=BACKENDS[job.get('backend', 'list')],
+                  rng=job.get('rng', 'python'))
+    n, k = job['n'], job['k']
+    if job.get('stats'):
+        return dict(stats=asdict(sim_stats(n, k, **kwargs)))
+    if job.get('out'):
+        with open(job['out'], 'w') as out:
+            sim_te(n, k, out=out, **kwargs)
+        return dict(out=job['out'])
+    return dict(genome=sim_te(n, k, **kwargs))
+
+
+def main(argv: list[str] | None = None,
+         stdin: IO[str] = sys.stdin) -> None:
+    """Run the jobs from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Run simulations given as JSON lines."
+    )
+    parser.add_argument('jobs', nargs='?', default='-',
+                        help="file with a job per line; - for stdin")
+    parser.add_argument('--backend', choices=list(BACKENDS))
+    parser.add_argument('--rng', choices=list(SAMPLERS))
+    parser.add_argument('--stats', action='store_true', default=None,
+                        help="report summary statistics, not genomes")
+    args = parser.parse_args(argv)
+    defaults = {key: value for key, value in vars(args).items()
+                if key != 'jobs' and value is not None}
+
+    jobs = stdin if args.jobs == '-' else open(args.jobs)
+    try:
+        for i, line in enumerate(line for line in jobs if line.strip()):
+            result = run_job({**defaults, **json.loads(line)})
+            print(json.dumps(dict(job=i, **result)), flush=True)
+    finally:
+        if jobs is not stdin:
+            jobs.close()
+
+
+if __name__ == '__main__':
+    main()
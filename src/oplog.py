@@ -0,0 +1,183 @@
+"""Logs of the operations a simulation did.
+
+A log records every operation applied to a genome, with its arguments
+and what it returned, so the exact same sequence can be run again on
+any genome class, without the simulator or its random numbers. The
+layout is
+
+    magic               8 bytes, b'TEOPLOG\\x01'
+    n                   uint64, the initial genome length
+    operations          (op, a, b, result) as '<Bqqq' records until the
+                        end of the file
+
+where (op, a, b) are as for Genome.apply_ops and result is the id
+returned by an insert or copy, or 0 if there was none. All integers
+are little-endian.
+
+>>> import io
+>>> from genome import ListGenome, RangeGenome
+>>> f = io.BytesIO()
+>>> with OpLogWriter(f, 20) as log:
+...     genome = RecordingGenome(ListGenome(20), log)
+...     genome.insert_te(5, 10), genome.copy_te(1, 20), genome.disable_te(1)
+(1, 2, None)
+>>> _ = f.seek(0)
+>>> str(replay(f, RangeGenome))
+'-----xxxxxxxxxx----------AAAAAAAAAA-----'
+"""
+
+from __future__ import annotations
+import struct
+from typing import IO, Any, Iterable, Iterator, Type
+
+import numpy as np
+
+from genome import COPY, DISABLE, INSERT, Genome
+
+MAGIC = b'TEOPLOG\x01'
+_N = struct.Struct('<Q')
+_OP = struct.Struct('<Bqqq')
+
+# The records as a NumPy structured type, for reading them in blocks
+OP_DTYPE = np.dtype([('op', 'u1'), ('a', '<i8'), ('b', '<i8'),
+                     ('result', '<i8')])
+assert OP_DTYPE.itemsize == _OP.size
+
+BLOCK = 4096  # operations per read or write
+
+
+class OpLogWriter:
+    """Writes operations to a log, a block at a time."""
+
+    def __init__(self, out: IO[bytes], n: int):
+        """Start a log on out for a genome of initial length n."""
+        self.out = out
+        self.buf = bytearray()
+        out.write(MAGIC)
+        out.write(_N.pack(n))
+
+    def record(self, op: int, a: int, b: int, result: int | None) -> None:
+        """Add an operation and its result to the log."""
+        self.buf += _OP.pack(op, a, b, result or 0)
+        if len(self.buf) >= BLOCK * _OP.size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered operations."""
+        self.out.write(self.buf)
+        self.buf = bytearray()
+
+    def __enter__(self) -> OpLogWriter:
+        """Use the log as a context manager; it is flushed at the end."""
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        """Flush the log."""
+        self.flush()
+
+
+class RecordingGenome:
+    """
+    A genome that logs its operations to an OpLogWriter.
+
+    Everything but the three operations is passed straight on to the
+    wrapped genome, as for profiling.ProfiledGenome.
+    """
+
+    def __init__(self, genome: Genome, log: OpLogWriter):
+        """Wrap genome and log its operations to log."""
+        self.genome = genome
+        self.log = log
+
+    def __getattr__(self, name: str) -> Any:
+        """Get everything else from the wrapped genome."""
+        return getattr(self.genome, name)
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return len(self.genome)
+
+    def __str__(self) -> str:
+        """Return a string representation of the genome."""
+        return str(self.genome)
+
+    def insert_te(self, pos: int, length: int) -> int:
+        """Insert a TE; see Genome.insert_te."""
+        te = self.genome.insert_te(pos, length)
+        self.log.record(INSERT, pos, length, te)
+        return te
+
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """Copy a TE; see Genome.copy_te."""
+        copy = self.genome.copy_te(te, offset)
+        self.log.record(COPY, te, offset, copy)
+        return copy
+
+    def disable_te(self, te: int) -> None:
+        """Disable a TE; see Genome.disable_te."""
+        self.genome.disable_te(te)
+        self.log.record(DISABLE, te, 0, None)
+
+    def apply_ops(self, ops: Iterable[tuple[int, int, int]] | Any
+                  ) -> list[int | None]:
+        """
+        Apply a batch of operations; see Genome.apply_ops.
+
+        The operations are applied one at a time, so each is logged,
+        even if the wrapped genome could do the batch faster.
+        """
+        return Genome.apply_ops(self, ops)  # type: ignore[arg-type]
+
+
+def read_ops(log: IO[bytes], block: int = BLOCK
+             ) -> tuple[int, Iterator[np.ndarray]]:
+    """
+    Read a log.
+
+    Returns the initial genome length and an iterator over the
+    operations as OP_DTYPE arrays of at most block operations, so the
+    log is never in memory all at once.
+    """
+    if log.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not an operation log")
+    (n,) = _N.unpack(log.read(_N.size))
+
+    def blocks() -> Iterator[np.ndarray]:
+        while data := log.read(block * OP_DTYPE.itemsize):
+            if len(data) % OP_DTYPE.itemsize:
+                raise ValueError("operation log ends in a partial record")
+            yield np.frombuffer(data, dtype=OP_DTYPE)
+
+    return n, blocks()
+
+
+def replay(log: IO[bytes] | str, genome_class: Type[Genome],
+           *, block: int = BLOCK, check: bool = True) -> Genome:
+    """
+    Run the operations in log on a new genome_class genome.
+
+    log is a binary file or the path of one. The operations are read
+    and applied a block at a time with Genome.apply_ops. If check is
+    true, a ValueError is raised if an operation returns something else
+    than it did when the log was recorded.
+    """
+    if isinstance(log, str):
+        with open(log, 'rb') as f:
+            return replay(f, genome_class, block=block, check=check)
+
+    n, blocks = read_ops(log, block)
+    genome = genome_class(n)
+    done = 0
+    for ops in blocks:
+        results = genome.apply_ops(ops[['op', 'a', 'b']])
+        if check:
+            got = np.array([r or 0 for r in results], dtype=np.int64)
+            wrong = np.flatnonzero(got != ops['result'])
+            if len(wrong):
+                i = int(wrong[0])
+                raise ValueError(
+                    f"operation {done + i} returned {results[i]} "
+                    f"but {int(ops['result'][i])} when it was logged"
+                )
+        done += len(ops)
+    return genome
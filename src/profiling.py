@@ -0,0 +1,228 @@
+"""Profiling the operations of a genome.
+
+Wrap a genome in a ProfiledGenome to record, for each of insert_te,
+copy_te and disable_te, how often it was called, how long the calls
+took and roughly how many nucleotides they touched:
+
+>>> from genome import ListGenome
+>>> profile = Profile()
+>>> genome = ProfiledGenome(ListGenome(20), profile)
+>>> genome.insert_te(5, 10)
+1
+>>> genome.copy_te(1, 20)
+2
+>>> genome.disable_te(1)
+>>> [(op, stats.calls, stats.elements) for op, stats in profile.ops.items()]
+[('insert', 1, 25), ('copy', 1, 15), ('disable', 1, 10)]
+
+Nothing is recorded, and nothing costs anything, for genomes that are
+not wrapped. sim_te, sim_stats and sim_genome wrap their genome when
+they are given a Profile.
+"""
+
+from __future__ import annotations
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any, Iterable, Iterator
+
+from genome import CHUNK_SIZE, Genome
+
+
+# Latencies are counted in buckets, 2**_BITS to each doubling, so the
+# percentiles are within about 6% however many calls there are.
+_BITS = 3
+
+
+def _bucket(ns: int) -> int:
+    """Get the histogram bucket for a latency of ns nanoseconds."""
+    if ns < 1 << _BITS:
+        return ns
+    shift = ns.bit_length() - 1 - _BITS
+    return ((shift + 1) << _BITS) + (ns >> shift) - (1 << _BITS)
+
+
+def _midpoint(bucket: int) -> float:
+    """Get the latency in the middle of a bucket, in nanoseconds."""
+    if bucket < 1 << _BITS:
+        return bucket
+    shift = (bucket >> _BITS) - 1
+    low = ((1 << _BITS) + (bucket & ((1 << _BITS) - 1))) << shift
+    return low + ((1 << shift) - 1) / 2
+
+
+@dataclass
+class OpStats:
+    """What we know about the calls of one operation."""
+
+    calls: int = 0
+    elements: int = 0       # nucleotides shifted or written, in total
+    ns: int = 0             # time spent in the operation, in total
+    max_ns: int = 0         # the longest call
+    # the number of calls with the latencies in each bucket, see _bucket
+    histogram: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        """Total time spent in the operation."""
+        return self.ns / 1e9
+
+    def add(self, ns: int, elements: int) -> None:
+        """Count a call that took ns nanoseconds."""
+        self.calls += 1
+        self.elements += elements
+        self.ns += ns
+        self.max_ns = max(self.max_ns, ns)
+        bucket = _bucket(ns)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + 1
+
+    def percentile(self, p: float) -> float:
+        """
+        Get the p'th percentile of the latencies in seconds.
+
+        The latencies are only kept as a histogram, so this is the
+        middle of the bucket the percentile is in, except that the
+        100th percentile is the exact maximum.
+
+        >>> stats = OpStats()
+        >>> for ns in (4000, 1000, 3000, 2000):
+        ...     stats.add(ns, 0)
+        >>> stats.percentile(50), stats.percentile(100)
+        (1.9835e-06, 4e-06)
+        """
+        if not self.calls:
+            return 0.0
+        rank = max(1, -(-self.calls * p // 100))  # nearest rank
+        if rank >= self.calls:
+            return self.max_ns / 1e9
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                return min(_midpoint(bucket), self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    def summary(self) -> dict[str, Any]:
+        """The statistics as JSON data."""
+        return dict(
+            calls=self.calls,
+            seconds=self.seconds,
+            p50=self.percentile(50),
+            p90=self.percentile(90),
+            p99=self.percentile(99),
+            max=self.percentile(100),
+            elements=self.elements,
+            elements_per_call=self.elements / self.calls if self.calls else 0,
+        )
+
+
+@dataclass
+class Profile:
+    """Statistics for each operation, collected by ProfiledGenome."""
+
+    ops: dict[str, OpStats] = field(default_factory=lambda: {
+        'insert': OpStats(), 'copy': OpStats(), 'disable': OpStats()
+    })
+
+    def record(self, op: str, ns: int, elements: int) -> None:
+        """Record a call of op that took ns nanoseconds."""
+        self.ops[op].add(ns, elements)
+
+    def report(self) -> dict[str, dict[str, Any]]:
+        """The statistics for each operation as JSON data."""
+        return {op: stats.summary() for op, stats in self.ops.items()}
+
+    def dump(self, out: IO[str]) -> None:
+        """Write the statistics to out as a table."""
+        print(f"{'op':>8} {'calls':>8} {'total s':>9} {'p50 us':>8} "
+              f"{'p90 us':>8} {'p99 us':>8} {'max us':>9} {'elems/call':>11}",
+              file=out)
+        for op, r in self.report().items():
+            print(f"{op:>8} {r['calls']:>8} {r['seconds']:>9.4f} "
+                  f"{r['p50'] * 1e6:>8.2f} {r['p90'] * 1e6:>8.2f} "
+                  f"{r['p99'] * 1e6:>8.2f} {r['max'] * 1e6:>9.2f} "
+                  f"{r['elements_per_call']:>11.1f}", file=out)
+
+
+class ProfiledGenome:
+    """
+    A genome that records its operations in a Profile.
+
+    Everything but the three operations is passed straight on to the
+    wrapped genome. The nucleotides an operation touches are the ones
+    it writes, plus, for genomes that shift the rest of the genome when
+    inserting (Genome.SHIFTS), the ones after the insertion point. The
+    tree-based genomes also visit O(log n) nodes, which isn't counted.
+    """
+
+    def __init__(self, genome: Genome, profile: Profile):
+        """Wrap genome and record its operations in profile."""
+        self.genome = genome
+        self.profile = profile
+
+    def __getattr__(self, name: str) -> Any:
+        """Get everything else from the wrapped genome."""
+        return getattr(self.genome, name)
+
+    def __len__(self) -> int:
+        """Current length of the genome."""
+        return len(self.genome)
+
+    def __str__(self) -> str:
+        """Return a string representation of the genome."""
+        return str(self.genome)
+
+    def iter_chunks(self, size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Yield the genome's string in pieces."""
+        return self.genome.iter_chunks(size)
+
+    def _span(self, te: int) -> tuple[int, int] | None:
+        """Get the start and length of te, or None if it isn't active."""
+        try:
+            return self.genome.te_span(te)
+        except KeyError:
+            return None
+
+    def _inserting(self, pos: int, length: int) -> int:
+        """Nucleotides touched by inserting length nucleotides at pos."""
+        if self.genome.SHIFTS:
+            return len(self.genome) - pos + length
+        return length
+
+    def insert_te(self, pos: int, length: int) -> int:
+        """Insert a TE; see Genome.insert_te."""
+        elements = self._inserting(pos, length)
+        start = time.perf_counter_ns()
+        te = self.genome.insert_te(pos, length)
+        self.profile.record('insert', time.perf_counter_ns() - start,
+                            elements)
+        return te
+
+    def copy_te(self, te: int, offset: int) -> int | None:
+        """Copy a TE; see Genome.copy_te."""
+        span = self._span(te)
+        elements = 0
+        if span is not None and len(self.genome):
+            pos = (span[0] + offset) % len(self.genome)
+            elements = self._inserting(pos, span[1])
+        start = time.perf_counter_ns()
+        copy = self.genome.copy_te(te, offset)
+        self.profile.record('copy', time.perf_counter_ns() - start, elements)
+        return copy
+
+    def disable_te(self, te: int) -> None:
+        """Disable a TE; see Genome.disable_te."""
+        span = self._span(te)
+        start = time.perf_counter_ns()
+        self.genome.disable_te(te)
+        self.profile.record('disable', time.perf_counter_ns() - start,
+                            0 if span is None else span[1])
+
+    def apply_ops(self, ops: Iterable[tuple[int, int, int]] | Any
+                  ) -> list[int | None]:
+        """
+        Apply a batch of operations; see Genome.apply_ops.
+
+        The operations are applied one at a time, so each is recorded,
+        even if the wrapped genome could do the batch faster.
+        """
+        return Genome.apply_ops(self, ops)  # type: ignore[arg-type]
@@ -1,16 +1,30 @@
 """A simulator of tandem repeats."""
 
 from __future__ import annotations
-import random as rand
-import numpy as np
-from enum import Enum
-from typing import Type
+import math
+import os
+import random
+from abc import ABC, abstractmethod
+from enum import IntEnum
+from typing import (
+    IO, TYPE_CHECKING, Any, AsyncIterator, Callable, Generator, Iterator,
+    Type
+)
 from genome import (
     Genome,
+    GenomeStats,
     ListGenome,
-    LinkedListGenome
+    LinkedListGenome,
+    RangeGenome
 )
-from dataclasses import dataclass
+from profiling import Profile, ProfiledGenome
+from dataclasses import asdict, dataclass
+
+# NumPy, and the modules that need it, take longer to import than a
+# small simulation takes to run, so they are imported where they are
+# used instead of here; see PySampler.
+if TYPE_CHECKING:
+    import numpy as np
 
 
 @dataclass
@@ -24,68 +38,578 @@ class SimParams:
     weights: tuple[float, float, float] = (0.1, 2.0, 1.0)
 
 
-class Ops(Enum):
-    """The different operations in the simulator."""
+class Ops(IntEnum):
+    """
+    The different operations in the simulator.
+
+    The values are the operation codes Genome.apply_ops takes.
+    """
 
     INSERT = 1
     COPY = 2
     DISABLE = 3
 
-    @staticmethod
-    def sample(weights: tuple[float, float, float]) -> Ops:
-        """Select which operation to do."""
-        return rand.choices(list(Ops), weights)[0]
+
+class Stream:
+    """
+    A stream of random numbers drawn in blocks.
+
+    draw(size) should return a NumPy array of size numbers. We call it
+    once per block and hand the numbers out one at a time from a Python
+    list, which is much cheaper than a call into NumPy per number.
+    """
+
+    def __init__(self, draw: Callable[[int], np.ndarray], block: int):
+        """Create a stream that draws block numbers at a time."""
+        self.draw = draw
+        self.block = block
+        self.buf: list = []
+        self.next = 0
+
+    def __call__(self) -> Any:
+        """Get the next number in the stream."""
+        if self.next == len(self.buf):
+            self.buf = self.draw(self.block).tolist()
+            self.next = 0
+        x = self.buf[self.next]
+        self.next += 1
+        return x
+
+
+class BaseSampler(ABC):
+    """
+    The random draws the simulator needs.
+
+    Subclasses provide the draws themselves, as the functions random(),
+    te_len() and te_offset(), and a way to save and restore their state
+    for checkpoints; the choices the simulator makes from the draws are
+    the same for all of them.
+    """
+
+    theta: SimParams
+    random: Callable[[], float]     # uniform in [0, 1)
+    te_len: Callable[[], int]       # geometric with mean theta.te_len
+    te_offset: Callable[[], int]    # geometric with mean theta.te_offset
+
+    def __init__(self, theta: SimParams,
+                 seed: int | np.random.SeedSequence | None = None):
+        """
+        Create a sampler for simulations with parameters theta.
+
+        Subclasses must call this, and seed their generator with seed.
+        """
+        self.theta = theta
+
+    @abstractmethod
+    def state(self) -> tuple[Any, list[list]]:
+        """
+        Get the sampler's state.
+
+        That is the state of the random number generator, which must be
+        JSON serialisable, and the numbers drawn but not handed out yet,
+        for each stream the sampler draws in blocks.
+        """
+        ...  # not implemented yet
+
+    @abstractmethod
+    def restore(self, rng_state: Any, bufs: list[list]) -> None:
+        """Restore a state from state(), possibly read back from JSON."""
+        ...  # not implemented yet
+
+    def op(self, active: int) -> Ops:
+        """Select which operation to do when there are active TEs."""
+        # weigh the operations with the number of active TEs
+        theta_ins, theta_cpy, theta_dis = self.theta.weights
+        u = self.random() * (theta_ins + active * (theta_cpy + theta_dis))
+        if u < theta_ins:
+            return Ops.INSERT
+        if u < theta_ins + active * theta_cpy:
+            return Ops.COPY
+        return Ops.DISABLE
+
+    def randint(self, n: int) -> int:
+        """Get a random number in 0, 1, ..., n - 1."""
+        return int(self.random() * n)
+
+
+class Sampler(BaseSampler):
+    """
+    The random draws the simulator needs, from NumPy.
+
+    All the draws come from a single NumPy Generator, so a seed gives
+    the same simulation every time, but they are drawn in blocks, one
+    Stream per kind of draw.
+    """
+
+    BLOCK = 1 << 12  # numbers per block
+
+    def __init__(self, theta: SimParams,
+                 seed: int | np.random.SeedSequence | None = None):
+        """Create a sampler for simulations with parameters theta."""
+        import numpy as np
+        super().__init__(theta, seed)
+        self.rng = rng = np.random.default_rng(seed)
+        self.streams = (
+            Stream(rng.random, self.BLOCK),
+            Stream(lambda size: rng.geometric(1 / theta.te_len, size),
+                   self.BLOCK),
+            Stream(lambda size: rng.geometric(1 / theta.te_offset, size),
+                   self.BLOCK),
+        )
+        self.random, self.te_len, self.te_offset = self.streams
+
+    def state(self) -> tuple[Any, list[list]]:
+        """
+        Get the sampler's state.
+
+        That is the state of the bit generator and the numbers each
+        stream has drawn but not handed out yet.
+        """
+        return (self.rng.bit_generator.state,
+                [stream.buf[stream.next:] for stream in self.streams])
+
+    def restore(self, rng_state: Any, bufs: list[list]) -> None:
+        """Restore a state from state()."""
+        self.rng.bit_generator.state = rng_state
+        for stream, buf in zip(self.streams, bufs):
+            stream.buf = buf
+            stream.next = 0
+
+
+class PySampler(BaseSampler):
+    """
+    The random draws the simulator needs, without NumPy.
+
+    The draws come from Python's random.Random instead, and the
+    geometric distributions are sampled by inversion. That is slower
+    per draw than Sampler, but doesn't import NumPy, so it is faster for
+    small simulations. A seed gives different simulations with the two
+    samplers.
+
+    >>> s = PySampler(SimParams(te_len=10), 1)
+    >>> lengths = [s.te_len() for _ in range(100_000)]
+    >>> min(lengths), round(sum(lengths) / len(lengths))
+    (1, 10)
+    """
+
+    def __init__(self, theta: SimParams,
+                 seed: int | np.random.SeedSequence | None = None):
+        """Create a sampler for simulations with parameters theta."""
+        if seed is not None and not isinstance(seed, int):
+            # A SeedSequence, as sim_many uses
+            seed = int.from_bytes(seed.generate_state(4).tobytes(), 'little')
+        super().__init__(theta, seed)
+        self.rng = random.Random(seed)
+        self.random = self.rng.random
+        self.te_len = self._geometric(1 / theta.te_len)
+        self.te_offset = self._geometric(1 / theta.te_offset)
+
+    def _geometric(self, p: float) -> Callable[[], int]:
+        """
+        Make a sampler for the geometric distribution on 1, 2, ....
+
+        That is the number of trials up to and including the first
+        success, when each succeeds with probability p, as for NumPy's
+        geometric().
+        """
+        if p >= 1:
+            return lambda: 1
+        scale = 1 / math.log1p(-p)
+        rand = self.rng.random
+        return lambda: int(math.log1p(-rand()) * scale) + 1
+
+    def state(self) -> tuple[Any, list[list]]:
+        """Get the sampler's state; there are no buffered numbers."""
+        return self.rng.getstate(), []
+
+    def restore(self, rng_state: Any, bufs: list[list]) -> None:
+        """Restore a state from state()."""
+        version, internal, gauss = rng_state  # lists, if read from JSON
+        self.rng.setstate((version, tuple(internal), gauss))
+
+
+# The samplers, by the names the simulation functions take
+SAMPLERS: dict[str, Type[BaseSampler]] = {
+    'numpy': Sampler,
+    'python': PySampler,
+}
+
+
+def _theta_json(theta: SimParams) -> dict:
+    """Get theta as it looks in a checkpoint header."""
+    return dict(asdict(theta), weights=list(theta.weights))
+
+
+def _seed_json(seed: int | np.random.SeedSequence | None) -> Any:
+    """Get seed as it looks in a checkpoint header."""
+    if seed is None or isinstance(seed, int):
+        return seed
+    return dict(entropy=seed.entropy, spawn_key=list(seed.spawn_key))
+
+
+@dataclass(frozen=True)
+class Progress:
+    """How far a simulation has come; see iter_sim."""
+
+    done: int       # operations done
+    total: int      # operations to do in all, k
+    length: int     # current length of the genome
+    active: int     # current number of active TEs
+    genome: Genome  # the genome itself, not a copy
+
+    @property
+    def finished(self) -> bool:
+        """Whether the simulation has done all its operations."""
+        return self.done == self.total
+
+
+def iter_sim(n: int, k: int,
+             *,  # the remaining args below must be given by keyword
+             theta: SimParams = SimParams(),
+             seed: int | np.random.SeedSequence | None = None,
+             genome_class: Type[Genome] = ListGenome,
+             rng: str = 'numpy',
+             every: int = 10_000,
+             checkpoint: str | None = None,
+             checkpoint_every: int = 100_000,
+             profile: Profile | None = None,
+             oplog: IO[bytes] | None = None
+             ) -> Generator[Progress, None, None]:
+    """Simulate a genome of initial size n for k operations, incrementally.
+
+    This is sim_genome as a generator. It yields a Progress every
+    `every` operations, and when it is done, so the caller can report
+    on the simulation, or stop it, along the way. Making a Progress is
+    O(1). The simulation only stops between operations, so if the
+    generator is closed early, the genome it has yielded is consistent,
+    with the operations done so far.
+
+    >>> for progress in iter_sim(30, 10, seed = 3,
+    ...                          theta = SimParams(te_len=10), every = 4):
+    ...     progress.done, progress.length, progress.active
+    (4, 51, 2)
+    (8, 54, 4)
+    (10, 64, 5)
+
+    See sim_genome for the other arguments.
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+    sampler = SAMPLERS[rng](theta, seed)
+    done = 0
+    if checkpoint is not None:
+        from checkpoint import load_checkpoint, save_checkpoint
+    if checkpoint is not None and os.path.exists(checkpoint):
+        saved = load_checkpoint(checkpoint, genome_class)
+        if (saved.meta['n'], saved.meta['k'], saved.meta['theta'],
+                saved.meta.get('sampler', 'numpy'),
+                saved.meta.get('seed')) != \
+                (n, k, _theta_json(theta), rng, _seed_json(seed)):
+            raise ValueError(
+                f"{checkpoint} is a checkpoint for a different simulation"
+            )
+        if oplog is not None:
+            raise ValueError("can't log operations when resuming from "
+                             f"{checkpoint}")
+        genome = saved.genome
+        sampler.restore(saved.meta['rng'], saved.streams)
+        done = saved.meta['done']
+    else:
+        genome = genome_class(n)
+    # The genome, maybe wrapped to profile or log the operations; the
+    # wrappers pass everything else on, so they are used as genomes.
+    ops: Any = genome if profile is None else ProfiledGenome(genome, profile)
+    log = None
+    if oplog is not None:
+        from oplog import OpLogWriter, RecordingGenome
+        log = OpLogWriter(oplog, len(genome))
+        ops = RecordingGenome(ops, log)
+
+    try:
+        for i in range(done, k):
+            match sampler.op(genome.num_active()):
+                case Ops.INSERT:
+                    pos = sampler.randint(len(genome) + 1)
+                    length = sampler.te_len()
+                    ops.insert_te(pos, length)
+
+                case Ops.COPY:
+                    te = genome.random_active(sampler)
+                    offset = sampler.te_offset()
+                    if sampler.random() < 0.5:
+                        offset = -offset
+                    ops.copy_te(te, offset)
+
+                case Ops.DISABLE:
+                    te = genome.random_active(sampler)
+                    ops.disable_te(te)
+
+            if checkpoint is not None and (i + 1) % checkpoint_every == 0:
+                rng_state, bufs = sampler.state()
+                meta = dict(n=n, k=k, theta=_theta_json(theta), done=i + 1,
+                            sampler=rng, seed=_seed_json(seed),
+                            rng=rng_state)
+                save_checkpoint(checkpoint, genome, meta, bufs)
+
+            if (i + 1) % every == 0 and i + 1 < k:
+                yield Progress(i + 1, k, len(genome), genome.num_active(),
+                               genome)
+    finally:
+        # Also when the generator is closed early
+        if log is not None:
+            log.flush()
+    yield Progress(k, k, len(genome), genome.num_active(), genome)
+
+
+def sim_genome(n: int, k: int,
+               *,  # the remaining args below must be given by keyword
+               theta: SimParams = SimParams(),
+               seed: int | np.random.SeedSequence | None = None,
+               genome_class: Type[Genome] = ListGenome,
+               rng: str = 'numpy',
+               checkpoint: str | None = None,
+               checkpoint_every: int = 100_000,
+               profile: Profile | None = None,
+               oplog: IO[bytes] | None = None) -> Genome:
+    """Simulate a genome of initial size n for k operations.
+
+    Returns the simulated genome. See sim_te and sim_stats for getting
+    the string or summary statistics for it.
+
+    rng is the name of the sampler for the random draws, see SAMPLERS.
+    NumPy's is fastest for big simulations, but 'python' doesn't need
+    to import NumPy, which takes longer than small simulations.
+
+    If checkpoint is a path, the simulation is saved there every
+    checkpoint_every operations. If the file already exists, the
+    simulation continues from it instead of starting over; the result
+    is the same as if it had never stopped. The checkpoint must be for
+    the same n, k, theta, seed and rng, or a ValueError is raised, so a
+    leftover checkpoint can't take the place of another simulation.
+
+    If profile is given, the calls of each operation are recorded in
+    it; see profiling.py. Without it, the genome isn't touched.
+
+    If oplog is a binary file, every operation and its result is
+    written to it, so the simulation can be replayed on any genome class
+    with oplog.replay(). A log must start with the initial genome, so it
+    can't be combined with resuming from a checkpoint.
+    """
+    for progress in iter_sim(n, k, theta=theta, seed=seed,
+                             genome_class=genome_class, rng=rng,
+                             every=max(k, 1),
+                             checkpoint=checkpoint,
+                             checkpoint_every=checkpoint_every,
+                             profile=profile, oplog=oplog):
+        pass
+    return progress.genome
+
+
+async def asim(n: int, k: int, **kwargs: Any) -> AsyncIterator[Progress]:
+    """Simulate a genome of initial size n for k operations, asynchronously.
+
+    This is iter_sim as an async iterator, taking the same arguments.
+    After every Progress it gives control back to the event loop, so
+    one loop can run many simulations side by side without threads.
+    Cancelling a task that runs it stops the simulation between
+    operations, as closing iter_sim does.
+
+    >>> import asyncio
+    >>> async def monitor(seed):
+    ...     return [p.done async for p in asim(30, 10, seed=seed, every=4)]
+    >>> async def main():
+    ...     return await asyncio.gather(monitor(1), monitor(2))
+    >>> asyncio.run(main())
+    [[4, 8, 10], [4, 8, 10]]
+    """
+    import asyncio
+    sim = iter_sim(n, k, **kwargs)
+    try:
+        for progress in sim:
+            yield progress
+            await asyncio.sleep(0)
+    finally:
+        sim.close()
 
 
 def sim_te(n: int, k: int,
            *,  # the remaining args below must be given by keyword
            theta: SimParams = SimParams(),
-           seed: int | None = None,
-           genome_class: Type[Genome] = ListGenome) -> str:
+           seed: int | np.random.SeedSequence | None = None,
+           genome_class: Type[Genome] = ListGenome,
+           rng: str = 'numpy',
+           out: IO[str] | None = None,
+           checkpoint: str | None = None,
+           checkpoint_every: int = 100_000,
+           profile: Profile | None = None,
+           oplog: IO[bytes] | None = None) -> str | None:
+    """Simulate a genome of initial size n for k operations.
+
+    Returns the final genome as a string, unless out is given, in which
+    case the genome is written to out a chunk at a time and None is
+    returned. Use that for large genomes. See sim_genome for rng,
+    checkpoint, checkpoint_every, profile and oplog.
+
+    >>> sim_te(30, 10, seed = 3, theta = SimParams(te_len=10))
+    '-------xxxAxxxxxxAxxxxxxAxxxxx-----------------x-A----AAAAAAAAA-'
+    >>> import io
+    >>> f = io.StringIO()
+    >>> sim_te(30, 10, seed = 3, theta = SimParams(te_len=10), out = f)
+    >>> f.getvalue()
+    '-------xxxAxxxxxxAxxxxxxAxxxxx-----------------x-A----AAAAAAAAA-'
+
+    With a profile we can see where the time went afterwards:
+
+    >>> profile = Profile()
+    >>> _ = sim_te(30, 10, seed = 3, theta = SimParams(te_len=10),
+    ...            profile = profile)
+    >>> {op: stats.calls for op, stats in profile.ops.items()}
+    {'insert': 3, 'copy': 5, 'disable': 2}
+    """
+    with sim_genome(n, k, theta=theta, seed=seed,
+                    genome_class=genome_class, rng=rng,
+                    checkpoint=checkpoint,
+                    checkpoint_every=checkpoint_every,
+                    profile=profile,
+                    oplog=oplog) as genome:
+        if out is not None:
+            genome.write_to(out)
+            return None
+        return str(genome)
+
+
+def sim_stats(n: int, k: int,
+              *,  # the remaining args below must be given by keyword
+              theta: SimParams = SimParams(),
+              seed: int | np.random.SeedSequence | None = None,
+              genome_class: Type[Genome] = ListGenome,
+              rng: str = 'numpy',
+              checkpoint: str | None = None,
+              checkpoint_every: int = 100_000,
+              profile: Profile | None = None,
+              oplog: IO[bytes] | None = None) -> GenomeStats:
     """Simulate a genome of initial size n for k operations.
 
-    >>> sim_te(30, 10, seed = 1984, theta = SimParams(te_len=10))
-    '---AAAA------------x--xAAAAxxx------AAAA-xxxxAAAA------'
+    Returns summary statistics for the final genome instead of the
+    genome itself, so we never build its string. See sim_genome for
+    rng, checkpoint, checkpoint_every, profile and oplog.
+
+    >>> sim_stats(30, 10, seed = 3, theta = SimParams(te_len=10))
+    ... # doctest: +NORMALIZE_WHITESPACE
+    GenomeStats(length=64, active=5, disabled=3,
+                te_lengths={1: 6, 9: 1, 19: 1},
+                bp={'-': 30, 'A': 13, 'x': 21})
     """
-    rand.seed(seed)
-    np.random.seed(seed)
+    with sim_genome(n, k, theta=theta, seed=seed,
+                    genome_class=genome_class, rng=rng,
+                    checkpoint=checkpoint,
+                    checkpoint_every=checkpoint_every,
+                    profile=profile,
+                    oplog=oplog) as genome:
+        return genome.stats()
+
+
+def _replicate(n: int, k: int, theta: SimParams,
+               seed: np.random.SeedSequence, genome_class: Type[Genome],
+               path: str | None, stats: bool) -> str | GenomeStats | None:
+    """Run one replicate for sim_many in a worker process."""
+    if stats:
+        return sim_stats(n, k, theta=theta, seed=seed,
+                         genome_class=genome_class)
+    if path is None:
+        return sim_te(n, k, theta=theta, seed=seed, genome_class=genome_class)
+    with open(path, 'w') as out:
+        sim_te(n, k, theta=theta, seed=seed, genome_class=genome_class,
+               out=out)
+    return path
 
-    genome = genome_class(n)
-    for _ in range(k):
-        active = genome.active_tes()
-        theta_ins, theta_cpy, theta_dis = theta.weights
-        # weigh the operations with the number of active TEs
-        op_weights = (theta_ins,
-                      len(active) * theta_cpy,
-                      len(active) * theta_dis)
-        match Ops.sample(op_weights):
-            case Ops.INSERT:
-                pos = rand.randint(0, len(genome))
-                length = np.random.geometric(1/theta.te_len)
-                genome.insert_te(pos, length)
 
-            case Ops.COPY:
-                te = rand.choice(active)
-                offset = np.random.geometric(1/theta.te_offset)
-                if rand.random() < 0.5:
-                    offset = -offset
-                genome.copy_te(te, offset)
+def sim_many(n: int, k: int, replicates: int,
+             *,  # the remaining args below must be given by keyword
+             theta: SimParams = SimParams(),
+             seeds: int | np.random.SeedSequence | None = None,
+             genome_class: Type[Genome] = ListGenome,
+             workers: int | None = None,
+             out_dir: str | None = None,
+             stats: bool = False
+             ) -> Iterator[tuple[int, str | GenomeStats]]:
+    """Simulate independent replicates in a pool of worker processes.
 
-            case Ops.DISABLE:
-                te = rand.choice(active)
-                genome.disable_te(te)
+    Replicate i runs sim_te(n, k) with the i'th seed spawned from seeds,
+    so the replicates are independent and the results only depend on
+    seeds, not on the number of workers or the order they finish in.
+    workers defaults to the number of CPUs.
 
-    return str(genome)
+    Yields (i, result) for each replicate as soon as it completes. The
+    result is the genome string; or, if out_dir is given, the path of
+    the file in out_dir the genome was written to; or, if stats is
+    true, the replicate's sim_stats. Nothing is kept once it has been
+    yielded.
 
+    >>> results = dict(sim_many(30, 10, 3, seeds=1, workers=2))
+    >>> sorted(results)
+    [0, 1, 2]
+    >>> import numpy as np
+    >>> seeds = np.random.SeedSequence(1).spawn(3)
+    >>> results[2] == sim_te(30, 10, seed=seeds[2])
+    True
+    >>> seeds = np.random.SeedSequence(1)
+    >>> dict(sim_many(30, 10, 3, seeds=seeds)) == results
+    True
+    >>> dict(sim_many(30, 10, 3, seeds=seeds)) == results
+    True
+
+    Children already spawned from seeds aren't used again:
+
+    >>> used = seeds.spawn(1)
+    >>> after = dict(sim_many(30, 10, 3, seeds=seeds))
+    >>> after[0] == sim_te(30, 10, seed=used[0]), after[0] == results[1]
+    (False, True)
+    """
+    import numpy as np
+    from concurrent.futures import (
+        FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+    )
+    if not isinstance(seeds, np.random.SeedSequence):
+        seeds = np.random.SeedSequence(seeds)
+    # spawn() changes the sequence it is called on, so spawn from a copy
+    # to leave the caller's seeds as they were. The copy carries on from
+    # the children already spawned, so the replicates don't reuse them.
+    seeds = np.random.SeedSequence(
+        seeds.entropy, spawn_key=seeds.spawn_key, pool_size=seeds.pool_size,
+        n_children_spawned=seeds.n_children_spawned
+    )
+    jobs = enumerate(seeds.spawn(replicates))
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(workers)
+    try:
+        # Only keep a few replicates per worker queued, so stopping
+        # early doesn't have to wait for all the rest.
+        pending: dict[Future[str | GenomeStats | None], int] = {}
+        while True:
+            for i, seed in jobs:
+                path = None if out_dir is None else \
+                    os.path.join(out_dir, f"replicate-{i}.txt")
+                job = pool.submit(_replicate, n, k, theta, seed,
+                                  genome_class, path, stats)
+                pending[job] = i
+                if len(pending) >= 2 * workers:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for job in done:
+                # pop it, so we don't hold on to the result after
+                # yielding it
+                i = pending.pop(job)
+                result = job.result()
+                assert result is not None
+                yield i, result
+    finally:
+        pool.shutdown(cancel_futures=True)
 
 if __name__ == '__main__':
-    import timeit
-    start_time = timeit.default_timer()
-    sim_te(1_000_000, 1000)
-    elapsed = timeit.default_timer() - start_time
-    print("Python lists:", elapsed)
-
-    start_time = timeit.default_timer()
-    sim_te(1_000_000, 1000, genome_class=LinkedListGenome)
-    elapsed = timeit.default_timer() - start_time
-    print("Linked lists:", elapsed)
+    # The benchmarks live in bench.py; this is kept so the old way of
+    # timing the implementations still works.
+    import bench
+    bench.main()
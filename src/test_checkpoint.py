@@ -0,0 +1,47 @@
+"""Testing checkpoints of simulations."""
+
+import os
+
+import numpy as np
+import pytest
+
+from genome import ListGenome, LinkedListGenome, RangeGenome
+from simulate import SimParams, sim_genome
+
+
+def test_resume(tmp_path) -> None:
+    """Test that a resumed simulation ends where an unbroken one does."""
+    theta = SimParams(te_len=5, te_offset=20)
+    expected = sim_genome(100, 2000, seed=4, theta=theta)
+
+    path = str(tmp_path / "sim.ckpt")
+    sim_genome(100, 2000, seed=4, theta=theta,
+               checkpoint=path, checkpoint_every=700)
+    assert os.path.exists(path)
+
+    # The checkpoint is from op 1400; resuming can rebuild the genome
+    # with another class.
+    for genome_class in (ListGenome, LinkedListGenome, RangeGenome):
+        genome = sim_genome(100, 2000, seed=4, theta=theta,
+                            genome_class=genome_class, checkpoint=path)
+        assert str(genome) == str(expected)
+        assert genome.active_tes() == expected.active_tes()
+        assert genome.stats() == expected.stats()
+
+
+def test_resume_other_seed(tmp_path) -> None:
+    """Test that a checkpoint isn't resumed with a different seed."""
+    path = str(tmp_path / "sim.ckpt")
+    sim_genome(100, 500, seed=1, checkpoint=path, checkpoint_every=100)
+    with pytest.raises(ValueError):
+        sim_genome(100, 500, seed=2, checkpoint=path)
+
+    seeds = np.random.SeedSequence(1).spawn(2)
+    path = str(tmp_path / "spawned.ckpt")
+    sim_genome(100, 500, seed=seeds[0], checkpoint=path,
+               checkpoint_every=100)
+    with pytest.raises(ValueError):
+        sim_genome(100, 500, seed=seeds[1], checkpoint=path)
+    same = np.random.SeedSequence(1).spawn(1)[0]
+    assert str(sim_genome(100, 500, seed=same, checkpoint=path)) == \
+        str(sim_genome(100, 500, seed=seeds[0]))
@@ -0,0 +1,27 @@
+"""Testing the genome implementations against each other."""
+
+from genome import BACKENDS, INSERT, ListGenome
+from fuzz import fuzz
+
+
+def test_backends_agree() -> None:
+    """Test that all the genomes do the same as ListGenome."""
+    assert list(fuzz(BACKENDS, range(30), n=30, k=100)) == []
+
+
+def test_fuzz_shrinks_failures() -> None:
+    """Test that the fuzzer finds a bug and shrinks it to a few ops."""
+    class Broken(ListGenome):
+        def disable_te(self, te: int) -> None:
+            if te in self.te and self.te.length(te) > 5:
+                return  # forgets to disable long TEs
+            super().disable_te(te)
+
+    failures = list(fuzz({'broken': Broken}, range(5), n=30, k=100))
+    assert failures
+    for failure in failures:
+        assert failure.backend == 'broken'
+        assert failure.n == 0
+        assert len(failure.ops) <= 3
+        assert any(op == INSERT and length > 5
+                   for op, _, length in failure.ops)
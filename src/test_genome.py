@@ -6,16 +6,29 @@
 # names that start with test_
 
 from genome import (
+    INSERT, COPY, DISABLE,
     Genome,
+    GenomeStats,
     ListGenome,
-    LinkedListGenome
+    ByteListGenome,
+    LinkedListGenome,
+    RangeGenome,
+    RopeGenome,
+    MmapGenome,
+    TEIndex
 )
 from typing import Type
+import random
 
 
 def run_genome_test(genome_class: Type[Genome]) -> None:
     """Test a Genome implementation."""
-    genome = genome_class(20)
+    with genome_class(20) as genome:
+        check_genome(genome)
+
+
+def check_genome(genome: Genome) -> None:
+    """Test a new genome of length 20."""
     assert str(genome) == "--------------------"
     assert genome.active_tes() == []
 
@@ -49,6 +62,18 @@ def run_genome_test(genome_class: Type[Genome]) -> None:
         "-----xxxxxAAAAAAAAAAxxxxx-----" \
         "xxxxxxxxxx-----xxxxxAAAAAAAAAAxxxxx-----"
     assert genome.active_tes() == [2, 5]
+    assert genome.num_active() == 2
+    assert genome.stats() == GenomeStats(
+        length=70, active=2, disabled=3, te_lengths={10: 5},
+        bp={'-': 20, 'A': 20, 'x': 30}
+    )
+    assert {genome.random_active(random.Random(seed))
+            for seed in range(20)} == {2, 5}
+
+    chunks = list(genome.iter_chunks(7))
+    assert ''.join(chunks) == str(genome)
+    assert all(len(chunk) == 7 for chunk in chunks[:-1])
+    assert 0 < len(chunks[-1]) <= 7
 
 
 def test_list_genome() -> None:
@@ -56,6 +81,139 @@ def test_list_genome() -> None:
     run_genome_test(ListGenome)
 
 
+def test_byte_list_genome() -> None:
+    """Test that the bytearray implementation works."""
+    run_genome_test(ByteListGenome)
+
+
 def test_linked_list_genome() -> None:
     """Test that the linked list implementation works."""
     run_genome_test(LinkedListGenome)
+
+
+def test_linked_list_genome_invariants() -> None:
+    """Test that the linked list keeps its size and index consistent."""
+    class CheckedGenome(LinkedListGenome):
+        debug = True
+    run_genome_test(CheckedGenome)
+
+
+def test_range_genome() -> None:
+    """Test that the run-length implementation works."""
+    run_genome_test(RangeGenome)
+
+
+def test_rope_genome() -> None:
+    """Test that the rope implementation works."""
+    run_genome_test(RopeGenome)
+
+
+def test_rope_genome_small_leaves() -> None:
+    """Test the rope when TEs span, and splits make, several leaves."""
+    class SmallLeaves(RopeGenome):
+        LEAF = 4
+    run_genome_test(SmallLeaves)
+
+
+def test_mmap_genome() -> None:
+    """Test that the memory-mapped implementation works."""
+    run_genome_test(MmapGenome)
+
+
+def test_mmap_genome_grows() -> None:
+    """Test that the memory-mapped genome can grow its file."""
+    with MmapGenome(10) as genome:
+        expected = ListGenome(10)
+        for g in (genome, expected):
+            for pos in range(0, 200_000, 1000):
+                g.insert_te(pos, 1000)
+            for te in range(1, 200, 3):
+                g.disable_te(te)
+        assert str(genome) == str(expected)
+        assert genome.active_tes() == expected.active_tes()
+        # the runs come from the pieces, not the file
+        assert list(genome.iter_runs()) == list(Genome.iter_runs(genome))
+
+
+def test_apply_ops() -> None:
+    """Test that a batch of operations matches the operations one by one."""
+    ops = [(INSERT, 5, 10), (INSERT, 10, 10), (COPY, 2, 20), (COPY, 2, -15),
+           (INSERT, 50, 10), (DISABLE, 3, 0), (COPY, 3, 5)]
+    for genome_class in (ListGenome, ByteListGenome,
+                         LinkedListGenome, RangeGenome, RopeGenome,
+                         MmapGenome):
+        with genome_class(20) as genome:
+            assert genome.apply_ops(ops[:3]) == [1, 2, 3]
+            assert genome.apply_ops(ops[3:]) == [4, 5, None, None]
+            assert str(genome) == \
+                "-----xxxxxAAAAAAAAAAxxxxx-----" \
+                "xxxxxxxxxx-----xxxxxAAAAAAAAAAxxxxx-----"
+            assert genome.active_tes() == [2, 5]
+
+
+def test_apply_ops_failure() -> None:
+    """Test that a failing batch leaves the operations before it applied."""
+    ops = [(INSERT, 5, 10), (INSERT, 10, 4), (DISABLE, 1, 0), (9, 0, 0)]
+    for genome_class in (ListGenome, ByteListGenome,
+                         LinkedListGenome, RangeGenome, RopeGenome,
+                         MmapGenome):
+        with genome_class(20) as genome:
+            try:
+                genome.apply_ops(ops)
+            except ValueError:
+                pass
+            else:
+                assert False, "unknown operation not rejected"
+            assert str(genome) == "-----xxxxxAAAAxxxxx---------------"
+            assert genome.active_tes() == [2]
+            assert genome.te_span(2) == (10, 4)
+            assert list(genome.iter_runs()) == \
+                [('-', 5, 0), ('x', 5, 0), ('A', 4, 2), ('x', 5, 0),
+                 ('-', 15, 0)]
+
+
+def test_runs_of_empty_tes() -> None:
+    """Test that TEs of length 0 keep their place through the runs."""
+    for genome_class in (ListGenome, ByteListGenome,
+                         LinkedListGenome, RangeGenome, RopeGenome,
+                         MmapGenome):
+        with genome_class(10) as genome:
+            genome.insert_te(3, 4)
+            genome.insert_te(1, 0)
+            genome.insert_te(14, 0)  # at the end
+            runs = list(genome.iter_runs())
+            assert runs == list(Genome.iter_runs(genome)) == \
+                [('-', 1, 0), ('A', 0, 2), ('-', 2, 0), ('A', 4, 1),
+                 ('-', 7, 0), ('A', 0, 3)]
+            with genome_class.from_runs(runs) as copy:
+                assert str(copy) == str(genome)
+                assert [copy.te_span(te) for te in (1, 2, 3)] == \
+                    [(3, 4), (1, 0), (14, 0)]
+
+
+def test_te_index() -> None:
+    """Test the TE index against TEs with explicitly shifted starts."""
+    rng = random.Random(1)
+    n = 100
+    index = TEIndex(n)
+    tes: dict[int, list[int]] = {}  # te -> [start, length]
+    for te in range(1, 300):
+        if tes and rng.random() < 0.3:
+            victim = rng.choice(list(tes))
+            assert index.remove(victim) == tuple(tes.pop(victim))
+            continue
+        pos, length = rng.randint(0, n), rng.randint(1, 10)
+        hits = [t for t, (start, size) in tes.items()
+                if start < pos <= start + size]
+        assert index.hit(pos) == (hits[0] if hits else None)
+        if hits:
+            index.remove(hits[0])
+            del tes[hits[0]]
+        for span in tes.values():
+            if span[0] >= pos:
+                span[0] += length
+        tes[te] = [pos, length]
+        index.insert(pos, te, length)
+        n += length
+        assert index.tree.total == n
+        assert {t: [index.start(t), index.length(t)] for t in index} == tes
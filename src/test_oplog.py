@@ -0,0 +1,25 @@
+"""Testing operation logs."""
+
+import io
+
+from genome import INSERT, COPY, DISABLE, ListGenome, RangeGenome
+from oplog import OpLogWriter, RecordingGenome, read_ops, replay
+
+
+def test_apply_ops_is_logged() -> None:
+    """Test that operations applied in a batch are logged too."""
+    ops = [(INSERT, 5, 10), (INSERT, 0, 3), (COPY, 1, 7), (DISABLE, 2, 0)]
+    f = io.BytesIO()
+    with OpLogWriter(f, 20) as log:
+        genome = RecordingGenome(ListGenome(20), log)
+        results = genome.apply_ops(ops)
+
+    f.seek(0)
+    n, blocks = read_ops(f)
+    logged = [tuple(int(x) for x in op) for block in blocks for op in block]
+    assert n == 20
+    assert logged == [(op, a, b, result or 0)
+                      for (op, a, b), result in zip(ops, results)]
+
+    f.seek(0)
+    assert str(replay(f, RangeGenome)) == str(genome)
@@ -0,0 +1,45 @@
+"""Testing the incremental simulations."""
+
+import asyncio
+
+from genome import RangeGenome
+from simulate import SimParams, asim, iter_sim, sim_genome
+
+
+def test_stopped_simulation_is_consistent() -> None:
+    """Test that a simulation stopped early leaves a usable genome."""
+    theta = SimParams(te_len=5, te_offset=20)
+    sim = iter_sim(100, 1000, seed=4, theta=theta, every=300)
+    progress = next(sim)
+    sim.close()
+    assert progress.done == 300 and not progress.finished
+    assert progress.length == len(progress.genome)
+    assert progress.active == progress.genome.num_active()
+
+    # The genome is where an uninterrupted run of 300 operations is
+    expected = sim_genome(100, 300, seed=4, theta=theta)
+    assert str(progress.genome) == str(expected)
+
+
+def test_cancelled_async_simulations() -> None:
+    """Test that an event loop can run and cancel many simulations."""
+    snapshots: dict[int, list[int]] = {}
+
+    async def monitor(seed: int) -> None:
+        async for progress in asim(100, 10_000, seed=seed, every=100,
+                                   genome_class=RangeGenome):
+            snapshots.setdefault(seed, []).append(progress.done)
+
+    async def main() -> None:
+        tasks = [asyncio.create_task(monitor(seed)) for seed in range(3)]
+        while not all(len(snapshots.get(seed, [])) >= 3
+                      for seed in range(3)):
+            await asyncio.sleep(0)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    for done in snapshots.values():
+        assert done[:3] == [100, 200, 300]
+        assert done[-1] < 10_000  # cancelled before the end